@@ -0,0 +1,117 @@
+from collections import defaultdict
+from compiled import CompiledNetwork
+
+
+def build_AOA(network) -> tuple:
+    '''
+    Converts a job-on-node network into a job-on-arc (AOA) network with few dummy activities.
+    Jobs with the same predecessor set start at the same event, and jobs that are
+    predecessors of the same family of predecessor sets finish at the same event.
+    Each predecessor set is then completed from the fewest events that cover it, reusing
+    the events of smaller predecessor sets where possible.
+
+    parameters:
+    network: Network or CompiledNetwork.
+
+    returns: number of events, arcs as (tail event, head event, job id or None for a dummy).
+    Events are numbered in topological order: 0 is the project start, the last one its finish.
+    '''
+    if not hasattr(network, 'forward_pass'):
+        network = network.compile()
+    n = len(network)
+    predecessor_sets = [frozenset(network.predecessors_of(i).tolist()) for i in range(n)]
+
+    # One start event per distinct predecessor set, the empty set being the project start
+    event_of_set = {frozenset(): 0}
+    sets_containing = defaultdict(list)
+    for predecessors in predecessor_sets:
+        if predecessors not in event_of_set:
+            event_of_set[predecessors] = len(event_of_set)
+            for job in predecessors:
+                sets_containing[job].append(predecessors)
+    event_count = len(event_of_set)
+
+    # Jobs needed by exactly the same predecessor sets finish at one event
+    groups = defaultdict(list)
+    for job in range(n):
+        groups[frozenset(sets_containing[job])].append(job)
+    end_of_job = [0] * n
+    groups_of_set = defaultdict(list)
+    for family, jobs in groups.items():
+        if not family:
+            # Sinks end at the project finish
+            event = event_count
+            event_count += 1
+        elif len(family) == 1:
+            # Only one set waits for these jobs, so they can end at its start event
+            event = event_of_set[next(iter(family))]
+        elif frozenset(jobs) in event_of_set:
+            # The group is a predecessor set of its own
+            event = event_of_set[frozenset(jobs)]
+        else:
+            event = event_count
+            event_count += 1
+        for job in jobs:
+            end_of_job[job] = event
+        for predecessors in family:
+            groups_of_set[predecessors].append((event, frozenset(jobs)))
+
+    # Job arcs; jobs sharing both events get their own finish event and a dummy
+    arcs = []
+    used = set()
+    for job in range(n):
+        tail, head = event_of_set[predecessor_sets[job]], end_of_job[job]
+        if (tail, head) in used:
+            arcs.append((tail, event_count, network.ids[job]))
+            arcs.append((event_count, head, None))
+            event_count += 1
+        else:
+            arcs.append((tail, head, network.ids[job]))
+            used.add((tail, head))
+
+    # Complete every predecessor set with a greedy cover of group events and subset events
+    for predecessors, event in event_of_set.items():
+        covers = {}
+        for tail, jobs in groups_of_set[predecessors]:
+            covers[tail] = covers.get(tail, frozenset()) | jobs
+        for job in predecessors:
+            for subset in sets_containing[job]:
+                if len(subset) < len(predecessors) and subset < predecessors:
+                    covers[event_of_set[subset]] = covers.get(event_of_set[subset], frozenset()) | subset
+        uncovered = set(predecessors) - covers.pop(event, frozenset())
+        while uncovered:
+            tail = max(covers, key=lambda tail: len(covers[tail] & uncovered))
+            uncovered -= covers.pop(tail)
+            if (tail, event) not in used:
+                arcs.append((tail, event, None))
+                used.add((tail, event))
+
+    # Renumber the events in topological order
+    tails, heads, _ = zip(*arcs) if arcs else ((), (), ())
+    events = CompiledNetwork.from_edges(range(event_count), [0.0] * event_count, tails, heads)
+    rank = [0] * event_count
+    for position, event in enumerate(events.order.tolist()):
+        rank[event] = position
+    return event_count, [(rank[tail], rank[head], job) for tail, head, job in arcs]
+
+
+def event_times(event_count, arcs, durations) -> tuple:
+    '''
+    earliest and latest occurrence time of every event of an AOA network
+
+    parameters:
+    event_count, arcs: as returned by build_AOA.
+    durations: dictionary of job id -> duration.
+    '''
+    # Integer durations keep integer times, which the diagrams print as labels
+    earliest = [0] * event_count
+    for tail, head, job in sorted(arcs, key=lambda arc: arc[0]):
+        finish = earliest[tail] + (durations[job] if job is not None else 0)
+        if finish > earliest[head]:
+            earliest[head] = finish
+    latest = [max(earliest, default=0)] * event_count
+    for tail, head, job in sorted(arcs, key=lambda arc: arc[1], reverse=True):
+        start = latest[head] - (durations[job] if job is not None else 0)
+        if start < latest[tail]:
+            latest[tail] = start
+    return earliest, latest
@@ -0,0 +1,147 @@
+import sys
+import gc
+import json
+import time
+import platform
+import tracemalloc
+from os.path import realpath, dirname
+import numpy as np
+from CPM import *
+from compiled import CompiledNetwork
+from aoa import build_AOA
+from generators import GENERATORS, to_jobs
+
+DEFAULT_SIZES = [10**2, 10**3, 10**4, 10**5, 10**6]
+# Cases are skipped at sizes where their projected time exceeds this
+TIME_LIMIT = 60.0
+# all_paths enumerates every path, so it only runs while the number of paths stays below this
+MAX_PATHS = 10**5
+
+
+def measure(function, *args) -> tuple:
+    '''
+    run function(*args) twice: once for the wall time, once under tracemalloc for
+    the peak memory it allocates
+
+    returns: seconds, peak bytes, result of the timed run
+    '''
+    gc.collect()
+    start = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - start
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def count_paths(network: CompiledNetwork) -> int:
+    # Number of source-to-sink paths, by dynamic programming over the topological order
+    paths = [1 if start == stop else 0 for start, stop in zip(network.pred_indptr[:-1].tolist(), network.pred_indptr[1:].tolist())]
+    for i in network.order.tolist():
+        for p in network.predecessors_of(i).tolist():
+            paths[i] += paths[p]
+    return sum(paths[i] for i in network.sinks.tolist())
+
+
+def assemble_states(jobs, network, critical_path):
+    # Job-on-arc states as the visualizer's StateAssembler expects them
+    from visualize import State, StateAssembler
+    states = {'0': State('0', is_critical=True)}
+    for job in network.sources:
+        states['0'].add_outgoing(job)
+    critical = set(critical_path)
+    for job in jobs.values():
+        states[job.id] = State(job.id, job in critical)
+        states[job.id].add_incoming(job)
+    for job in jobs.values():
+        for predecessor_id in job.predecessors:
+            states[predecessor_id].add_outgoing(job)
+    return StateAssembler(states)(jobs, list(critical_path))
+
+
+def run_cases(jobs, compiled) -> list:
+    '''
+    the benchmark cases of one network as (name, function, enabled, exponent);
+    exponent is the expected growth of the run time with the job count, used to
+    project the time at the next size (StateAssembler compares every pair of states)
+    '''
+    network = Network(jobs, lazy_paths=True, max_critical_paths=MAX_CRITICAL_PATHS)
+    results = CPM(network)
+    path_count = count_paths(compiled)
+    return [
+        ('Network', lambda: Network(jobs, lazy_paths=True, max_critical_paths=MAX_CRITICAL_PATHS), True, 1),
+        ('topological_sort', lambda: topological_sort(list(jobs.values()), network.successors), True, 1),
+        ('CPM', lambda: CPM(Network(jobs, lazy_paths=True, max_critical_paths=MAX_CRITICAL_PATHS)), True, 1),
+        ('all_paths', network.all_paths, path_count <= MAX_PATHS, 1),
+        ('StateAssembler', lambda: assemble_states(jobs, network, results[5]), True, 3),
+        ('build_AOA', lambda: build_AOA(compiled), True, 1),
+        ('CompiledNetwork', lambda: CompiledNetwork.from_jobs(jobs.values()), True, 1),
+        ('compiled_cpm', compiled.cpm, True, 1),
+    ]
+
+
+def benchmark(sizes=DEFAULT_SIZES, generators=tuple(GENERATORS), seed=0, time_limit=TIME_LIMIT, log=print) -> dict:
+    '''
+    time every case on every generated network
+
+    parameters:
+    sizes: job counts to generate.
+    generators: names from generators.GENERATORS.
+    seed: seed of the generators, so runs are comparable.
+    time_limit: a case is skipped once its projected time exceeds this many seconds.
+
+    returns: dictionary ready for json, with one record per generator, size and case
+    '''
+    records = []
+    for name in generators:
+        last_run = {}
+        for n in sizes:
+            durations, sources, targets = GENERATORS[name](n, seed=seed)
+            jobs = to_jobs(durations, sources, targets)
+            compiled = CompiledNetwork.from_edges(range(n), durations, sources, targets)
+            for case, function, enabled, exponent in run_cases(jobs, compiled):
+                record = {'generator': name, 'jobs': n, 'edges': len(sources), 'case': case}
+                projected = 0.0
+                if case in last_run:
+                    last_n, last_seconds = last_run[case]
+                    projected = last_seconds * (n / last_n) ** exponent
+                if not enabled or projected > time_limit:
+                    record['skipped'] = True
+                else:
+                    seconds, peak, _ = measure(function)
+                    record.update(seconds=seconds, peak_bytes=peak)
+                    last_run[case] = (n, seconds)
+                records.append(record)
+                if log is not None:
+                    log(f"{name:16s} {n:>8d} {case:18s} " + ('skipped' if record.get('skipped') else f"{record['seconds']:10.4f} s {record['peak_bytes']/2**20:10.1f} MiB"))
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'seed': seed,
+        'results': records,
+    }
+
+
+def main():
+    outputpath = dirname(realpath(__file__))+'/output/benchmark.json'
+    sizes = DEFAULT_SIZES
+    generators = tuple(GENERATORS)
+    if len(sys.argv) > 1:
+        outputpath = sys.argv[1]
+    if len(sys.argv) > 2:
+        sizes = [size for size in DEFAULT_SIZES if size <= int(float(sys.argv[2]))]
+    if len(sys.argv) > 3:
+        generators = sys.argv[3].split(',')
+
+    report = benchmark(sizes, generators)
+    with open(outputpath, 'w') as file:
+        json.dump(report, file, indent=2)
+    print('Saved to', outputpath)
+
+if __name__ == '__main__':
+    main()
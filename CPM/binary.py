@@ -0,0 +1,109 @@
+import mmap
+import struct
+import numpy as np
+from compiled import CompiledNetwork, LevelSchedule
+from topology import numeric_id
+
+# File layout: a fixed header followed by contiguous arrays, each starting on an 8-byte boundary.
+#   header: magic, version, id kind, job count, edge count, forward/backward level counts, id blob size
+#   durations float64[n]
+#   pred_indptr int64[n+1], pred_indices int32[m], succ_indptr int64[n+1], succ_indices int32[m]
+#   forward and backward level schedules: order int64[n], level_indptr int64[levels+1],
+#       edge_indptr int64[n+1], edge_sources int32[m]
+#   ids: int32[n] when every id is an integer, otherwise offsets int64[n+1] and a utf-8 blob
+MAGIC = b'CPMNET\x00\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIIQQQQQ')
+NUMERIC_IDS = 0
+STRING_IDS = 1
+
+
+def save_network(network, path) -> None:
+    '''
+    write a network in the binary format read by load_network
+
+    parameters:
+    network: Network or CompiledNetwork.
+    '''
+    if not hasattr(network, 'forward_pass'):
+        network = network.compile()
+    n, m = len(network), len(network.pred_indices)
+    values = [numeric_id(id) for id in network.ids]
+    # Ids are stored as integers only when they convert back unchanged ('05' does not)
+    numeric = all(value is not None and str(value) == id and -2**31 <= value < 2**31 for id, value in zip(network.ids, values))
+    if numeric:
+        id_arrays = [np.array(values, dtype=np.int32)]
+        blob_size = 0
+    else:
+        encoded = [id.encode('utf-8') for id in network.ids]
+        offsets = np.concatenate(([0], np.cumsum([len(id) for id in encoded]))).astype(np.int64)
+        id_arrays = [offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)]
+        blob_size = int(offsets[-1])
+
+    forward, backward = network.forward, network.backward
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, NUMERIC_IDS if numeric else STRING_IDS, n, m,
+                               len(forward.level_indptr)-1, len(backward.level_indptr)-1, blob_size))
+        for array, dtype in _layout(network, id_arrays):
+            _write_aligned(file, np.ascontiguousarray(array, dtype=dtype))
+
+
+def load_network(path, mmap_mode=True) -> CompiledNetwork:
+    '''
+    read a network written by save_network.
+    With mmap_mode the arrays are read-only views of the memory-mapped file, so
+    repeated runs and worker processes share the same pages instead of copying them.
+    '''
+    with open(path, 'rb') as file:
+        if mmap_mode:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = file.read()
+    magic, version, id_kind, n, m, forward_levels, backward_levels, blob_size = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} network file')
+
+    shapes = [('f8', n), ('i8', n+1), ('i4', m), ('i8', n+1), ('i4', m),
+              ('i8', n), ('i8', forward_levels+1), ('i8', n+1), ('i4', m),
+              ('i8', n), ('i8', backward_levels+1), ('i8', n+1), ('i4', m)]
+    if id_kind == NUMERIC_IDS:
+        shapes += [('i4', n)]
+    else:
+        shapes += [('i8', n+1), ('u1', blob_size)]
+
+    arrays = []
+    offset = HEADER.size
+    for dtype, count in shapes:
+        offset = _align(offset)
+        arrays.append(np.frombuffer(buffer, dtype=dtype, count=count, offset=offset))
+        offset += arrays[-1].nbytes
+
+    durations, pred_indptr, pred_indices, succ_indptr, succ_indices = arrays[:5]
+    forward = LevelSchedule.from_arrays(*arrays[5:9])
+    backward = LevelSchedule.from_arrays(*arrays[9:13])
+    if id_kind == NUMERIC_IDS:
+        ids = [str(id) for id in arrays[13].tolist()]
+    else:
+        offsets, blob = arrays[13].tolist(), arrays[14].tobytes()
+        ids = [blob[offsets[i]:offsets[i+1]].decode('utf-8') for i in range(n)]
+    return CompiledNetwork.from_arrays(ids, durations, pred_indptr, pred_indices, succ_indptr, succ_indices, forward, backward)
+
+
+def _layout(network, id_arrays) -> list:
+    forward, backward = network.forward, network.backward
+    arrays = [(network.durations, 'f8'),
+              (network.pred_indptr, 'i8'), (network.pred_indices, 'i4'),
+              (network.succ_indptr, 'i8'), (network.succ_indices, 'i4')]
+    for schedule in (forward, backward):
+        arrays += [(schedule.order, 'i8'), (schedule.level_indptr, 'i8'),
+                   (schedule.edge_indptr, 'i8'), (schedule.edge_sources, 'i4')]
+    return arrays + [(array, array.dtype) for array in id_arrays]
+
+
+def _align(offset) -> int:
+    return (offset + 7) // 8 * 8
+
+
+def _write_aligned(file, array) -> None:
+    file.write(b'\x00' * (_align(file.tell()) - file.tell()))
+    file.write(array.tobytes())
@@ -0,0 +1,255 @@
+import numpy as np
+from topology import CycleError
+
+
+class CompiledNetwork(object):
+    def __init__(self, ids, durations, pred_indptr, pred_indices) -> None:
+        '''
+        parameters:
+        ids: job ids, job i of the network is ids[i].
+        durations: duration of each job.
+        pred_indptr, pred_indices: predecessors of job i in CSR form,
+            pred_indices[pred_indptr[i]:pred_indptr[i+1]].
+        '''
+        self.ids = [str(id) for id in ids]
+        self.index = {id: i for i, id in enumerate(self.ids)}
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.pred_indptr = np.asarray(pred_indptr, dtype=np.int64)
+        self.pred_indices = np.asarray(pred_indices, dtype=np.int32)
+        self.succ_indptr, self.succ_indices = transpose(self.pred_indptr, self.pred_indices, len(self.ids))
+
+        # Level schedules: every job only depends on jobs of a lower level,
+        # so each level can be relaxed with a single vectorized operation
+        self.forward = LevelSchedule(self.pred_indptr, self.pred_indices, self.succ_indptr, self.succ_indices, self.ids)
+        self.backward = LevelSchedule(self.succ_indptr, self.succ_indices, self.pred_indptr, self.pred_indices, self.ids)
+
+    @classmethod
+    def from_jobs(cls, jobs) -> 'CompiledNetwork':
+        '''
+        parameters:
+        jobs: iterable of jobs (anything with id, duration and predecessors).
+        '''
+        jobs = list(jobs)
+        index = {job.id: i for i, job in enumerate(jobs)}
+        pred_indptr = np.zeros(len(jobs)+1, dtype=np.int64)
+        pred_indices = []
+        for i, job in enumerate(jobs):
+            pred_indices += [index[predecessor] for predecessor in job.predecessors]
+            pred_indptr[i+1] = len(pred_indices)
+        durations = [job.duration for job in jobs]
+        return cls(index.keys(), durations, pred_indptr, pred_indices)
+
+    @classmethod
+    def from_edges(cls, ids, durations, sources, targets) -> 'CompiledNetwork':
+        '''
+        parameters:
+        ids, durations: job ids and durations by job position.
+        sources, targets: positions of the predecessor and successor of every precedence.
+        '''
+        targets = np.asarray(targets, dtype=np.int32)
+        order = np.argsort(targets, kind='stable')
+        pred_indptr = np.concatenate(([0], np.cumsum(np.bincount(targets, minlength=len(ids)))))
+        return cls(ids, durations, pred_indptr, np.asarray(sources, dtype=np.int32)[order])
+
+    @classmethod
+    def from_arrays(cls, ids, durations, pred_indptr, pred_indices, succ_indptr, succ_indices, forward, backward) -> 'CompiledNetwork':
+        '''
+        reassemble a network from precomputed arrays (e.g. memory-mapped), without copying them
+        '''
+        network = cls.__new__(cls)
+        network.ids = ids
+        network.index = {id: i for i, id in enumerate(ids)}
+        network.durations = durations
+        network.pred_indptr, network.pred_indices = pred_indptr, pred_indices
+        network.succ_indptr, network.succ_indices = succ_indptr, succ_indices
+        network.forward, network.backward = forward, backward
+        return network
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def order(self) -> np.ndarray:
+        '''
+        topological order of the jobs
+        '''
+        return self.forward.order
+
+    @property
+    def sources(self) -> np.ndarray:
+        return np.flatnonzero(np.diff(self.pred_indptr) == 0)
+
+    @property
+    def sinks(self) -> np.ndarray:
+        return np.flatnonzero(np.diff(self.succ_indptr) == 0)
+
+    def predecessors_of(self, i) -> np.ndarray:
+        return self.pred_indices[self.pred_indptr[i]:self.pred_indptr[i+1]]
+
+    def successors_of(self, i) -> np.ndarray:
+        return self.succ_indices[self.succ_indptr[i]:self.succ_indptr[i+1]]
+
+    def forward_pass(self, durations=None) -> tuple:
+        '''
+        earliest start and finish times of every job.
+        durations may also be an (S x N) matrix, one scenario per row.
+        '''
+        if durations is None:
+            durations = self.durations
+        earliest_start_time = self.forward.relax(durations, np.maximum, 0.0)
+        earliest_finish_time = earliest_start_time + durations
+        return earliest_start_time, earliest_finish_time
+
+    def backward_pass(self, makespan, durations=None) -> tuple:
+        '''
+        latest start and finish times of every job for the given makespan
+        (one makespan per row for an (S x N) duration matrix)
+        '''
+        if durations is None:
+            durations = self.durations
+        makespan = np.expand_dims(makespan, -1)
+        # Relax the negated times, so that the same max-recursion serves the backward pass
+        latest_finish_time = -self.backward.relax(durations, np.maximum, -makespan)
+        latest_start_time = latest_finish_time - durations
+        return latest_start_time, latest_finish_time
+
+    def cpm(self, durations=None) -> tuple:
+        earliest_start_time, earliest_finish_time = self.forward_pass(durations)
+        makespan = earliest_finish_time.max(axis=-1, initial=0.0)
+        latest_start_time, latest_finish_time = self.backward_pass(makespan, durations)
+        slacks = latest_start_time - earliest_start_time
+        return earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, makespan
+
+    def to_dict(self, values) -> dict:
+        '''
+        map an array indexed by job position back to job ids
+        '''
+        return {id: value for id, value in zip(self.ids, values.tolist())}
+
+
+class JobTable(object):
+    __slots__ = ('ids', 'index', 'columns')
+
+    def __init__(self, ids, **columns) -> None:
+        '''
+        Struct-of-arrays job table: one NumPy array per attribute instead of one object per job.
+
+        parameters:
+        ids: job ids, row i of every column belongs to ids[i].
+        columns: named per-job values, such as duration or optimistic/most_likely/pessimistic.
+        '''
+        self.ids = [str(id) for id in ids]
+        self.index = {id: i for i, id in enumerate(self.ids)}
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+        for name, values in self.columns.items():
+            if len(values) != len(self.ids):
+                raise ValueError(f'column {name} has {len(values)} rows for {len(self.ids)} jobs')
+
+    @classmethod
+    def from_jobs(cls, jobs, columns=('duration',)) -> 'JobTable':
+        jobs = list(jobs)
+        return cls([job.id for job in jobs], **{name: [getattr(job, name) for job in jobs] for name in columns})
+
+    @classmethod
+    def from_rows(cls, rows, columns) -> 'JobTable':
+        '''
+        parameters:
+        rows: iterable of dictionaries, e.g. the rows of loader.read_rows.
+        columns: names of the numeric columns to keep.
+        '''
+        ids = []
+        values = {name: [] for name in columns}
+        for row in rows:
+            ids.append(row['id'])
+            for name in columns:
+                values[name].append(row[name])
+        return cls(ids, **{name: np.asarray(column, dtype=np.float64) for name, column in values.items()})
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, name) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, ids) -> 'JobTable':
+        '''
+        rows of the given ids, e.g. reordered to match a CompiledNetwork
+        '''
+        rows = np.array([self.index[id] for id in ids], dtype=np.int64)
+        return JobTable(ids, **{name: values[rows] for name, values in self.columns.items()})
+
+
+class LevelSchedule(object):
+    def __init__(self, in_indptr, in_indices, out_indptr, out_indices, ids) -> None:
+        '''
+        Groups the jobs by level, the length of the longest chain of incoming edges.
+
+        parameters:
+        in_indptr, in_indices: jobs each job waits for, in CSR form.
+        out_indptr, out_indices: jobs waiting for each job, in CSR form.
+        ids: job ids, used to report cycles.
+        '''
+        n = len(in_indptr) - 1
+        in_degree = np.diff(in_indptr).copy()
+        level = np.full(n, -1, dtype=np.int64)
+        frontier = np.flatnonzero(in_degree == 0)
+        depth = 0
+        while len(frontier):
+            level[frontier] = depth
+            waiting, counts = np.unique(gather(out_indptr, out_indices, frontier), return_counts=True)
+            in_degree[waiting] -= counts
+            frontier = waiting[in_degree[waiting] == 0]
+            depth += 1
+        if np.any(level < 0):
+            raise CycleError(ids[i] for i in np.flatnonzero(level < 0))
+
+        self.order = np.argsort(level, kind='stable')
+        self.level_indptr = np.searchsorted(level[self.order], np.arange(depth+1))
+        counts = np.diff(in_indptr)[self.order]
+        self.edge_indptr = np.concatenate(([0], np.cumsum(counts)))
+        self.edge_sources = gather(in_indptr, in_indices, self.order)
+
+    @classmethod
+    def from_arrays(cls, order, level_indptr, edge_indptr, edge_sources) -> 'LevelSchedule':
+        schedule = cls.__new__(cls)
+        schedule.order, schedule.level_indptr = order, level_indptr
+        schedule.edge_indptr, schedule.edge_sources = edge_indptr, edge_sources
+        return schedule
+
+    def relax(self, weights, reduce, initial) -> np.ndarray:
+        '''
+        value[j] = reduce(value[i] + weights[i] for every incoming i), or initial without incoming edges
+        '''
+        value = np.full(np.shape(weights), initial, dtype=np.float64)
+        finish = value + weights
+        for level in range(1, len(self.level_indptr)-1):
+            start, stop = self.level_indptr[level], self.level_indptr[level+1]
+            nodes = self.order[start:stop]
+            edges = self.edge_sources[self.edge_indptr[start]:self.edge_indptr[stop]]
+            offsets = self.edge_indptr[start:stop] - self.edge_indptr[start]
+            value[..., nodes] = reduce.reduceat(finish[..., edges], offsets, axis=-1)
+            finish[..., nodes] = value[..., nodes] + weights[..., nodes]
+        return value
+
+
+def gather(indptr, indices, rows) -> np.ndarray:
+    '''
+    concatenation of the CSR rows indices[indptr[r]:indptr[r+1]] for r in rows
+    '''
+    starts = indptr[rows]
+    counts = indptr[rows+1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return indices[offsets + np.arange(total)]
+
+
+def transpose(indptr, indices, n) -> tuple:
+    '''
+    reverse the edges of a CSR adjacency
+    '''
+    rows = np.repeat(np.arange(n, dtype=indices.dtype), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    t_indptr = np.concatenate(([0], np.cumsum(np.bincount(indices, minlength=n)))).astype(np.int64)
+    return t_indptr, rows[order]
@@ -0,0 +1,112 @@
+import numpy as np
+from topology import connected_components
+
+
+class FloatAnalysis(object):
+    def __init__(self, network, durations=None, tolerance=1e-9) -> None:
+        '''
+        Total, free and independent float of every job, with indexes sorted by float
+        so that near-critical queries only search instead of scanning the network.
+
+        parameters:
+        network: Network or CompiledNetwork.
+        durations: durations by job position, the network's own by default.
+        tolerance: float at or below which two floats count as equal (and a job as critical).
+
+        total float: how long a job can slip without delaying the project.
+        free float: how long it can slip without delaying any successor's earliest start.
+        independent float: how long it can slip even when its predecessors finish as late
+            as possible and its successors start as early as possible.
+        '''
+        if not hasattr(network, 'forward_pass'):
+            network = network.compile()
+        self.network = network
+        self.tolerance = tolerance
+        durations = network.durations if durations is None else np.asarray(durations, dtype=np.float64)
+        self.earliest_start_time, self.earliest_finish_time, self.latest_start_time, self.latest_finish_time, _, self.makespan = network.cpm(durations)
+
+        # Earliest start of the first successor (the project end for sinks) and
+        # latest finish of the last predecessor (the project start for sources)
+        next_start = reduce_rows(network.succ_indptr, self.earliest_start_time[network.succ_indices], np.minimum, self.makespan)
+        previous_finish = reduce_rows(network.pred_indptr, self.latest_finish_time[network.pred_indices], np.maximum, 0.0)
+        self.total = self.latest_start_time - self.earliest_start_time
+        self.free = next_start - self.earliest_finish_time
+        self.independent = np.maximum(next_start - previous_finish - durations, 0.0)
+
+        # Jobs by total float, ties by earliest start
+        self.order = np.lexsort((self.earliest_start_time, self.total))
+        self.sorted_total = self.total[self.order]
+        self.__chains = None
+
+    def __len__(self) -> int:
+        return len(self.total)
+
+    def count_within(self, k) -> int:
+        '''
+        number of jobs with total float <= k
+        '''
+        return int(np.searchsorted(self.sorted_total, k + self.tolerance, side='right'))
+
+    def within(self, k) -> list:
+        '''
+        ids of the jobs with total float <= k, most critical first
+        '''
+        ids = self.network.ids
+        return [ids[i] for i in self.order[:self.count_within(k)].tolist()]
+
+    def most_critical(self, n) -> list:
+        '''
+        ids and total floats of the n jobs with the least total float
+        '''
+        ids = self.network.ids
+        return [(ids[i], total) for i, total in zip(self.order[:n].tolist(), self.sorted_total[:n].tolist())]
+
+    def chains(self, n=None) -> list:
+        '''
+        the n most critical chains: groups of jobs linked by precedences without
+        any float between them and sharing one total float (the critical path is the first).
+
+        returns: list of (total float, job ids in topological order), least float first
+        '''
+        if self.__chains is None:
+            self.__chains = self.__build_chains()
+        return self.__chains[:n]
+
+    def as_dicts(self) -> tuple:
+        '''
+        total, free and independent float keyed by job id
+        '''
+        return self.network.to_dict(self.total), self.network.to_dict(self.free), self.network.to_dict(self.independent)
+
+    def __build_chains(self) -> list:
+        network = self.network
+        n = len(network)
+        targets = np.repeat(np.arange(n, dtype=np.int32), np.diff(network.pred_indptr))
+        sources = network.pred_indices
+        # Keep the precedences that are tight and join jobs of the same total float
+        tight = (np.abs(self.earliest_start_time[targets] - self.earliest_finish_time[sources]) <= self.tolerance) \
+            & (np.abs(self.total[targets] - self.total[sources]) <= self.tolerance)
+        labels = np.asarray(connected_components(n, sources[tight].tolist(), targets[tight].tolist()), dtype=np.int64)
+
+        position = np.empty(n, dtype=np.int64)
+        position[network.order] = np.arange(n)
+        members = np.lexsort((position, labels))
+        bounds = np.searchsorted(labels[members], np.arange(labels.max()+2 if n else 1))
+        chains = []
+        for label in range(len(bounds)-1):
+            jobs = members[bounds[label]:bounds[label+1]]
+            chains.append((float(self.total[jobs].min()), [network.ids[i] for i in jobs.tolist()]))
+        chains.sort(key=lambda chain: chain[0])
+        return chains
+
+
+def reduce_rows(indptr, values, reduce, empty) -> np.ndarray:
+    '''
+    reduce(values[indptr[i]:indptr[i+1]]) for every row i of a CSR layout, empty for empty rows
+    '''
+    counts = np.diff(indptr)
+    result = np.full(len(counts), empty, dtype=np.float64)
+    rows = np.flatnonzero(counts)
+    if len(rows):
+        result[rows] = reduce.reduceat(values, indptr[rows])
+    return result
@@ -0,0 +1,92 @@
+import numpy as np
+from CPM import Job
+
+
+def layered_network(n, width=100, max_predecessors=3, max_duration=10, seed=0) -> tuple:
+    '''
+    jobs in layers of width jobs; every job after the first layer waits for
+    1..max_predecessors random jobs of the layer before it
+
+    returns: durations, precedence sources, precedence targets (job positions 0..n-1)
+    '''
+    rng = np.random.default_rng(seed)
+    durations = rng.integers(1, max_duration+1, n).astype(np.float64)
+    jobs = np.arange(width, n)
+    previous_layer = (jobs // width - 1) * width
+    counts = rng.integers(1, max_predecessors+1, len(jobs))
+    targets = np.repeat(jobs, counts)
+    sources = np.repeat(previous_layer, counts) + rng.integers(0, width, len(targets))
+    return (durations,) + _unique_edges(sources, targets, n)
+
+
+def random_dag(n, mean_predecessors=2.0, window=1000, max_duration=10, seed=0) -> tuple:
+    '''
+    random DAG: every job waits for a Poisson number of random earlier jobs, drawn
+    from the window jobs before it
+
+    returns: durations, precedence sources, precedence targets (job positions 0..n-1)
+    '''
+    rng = np.random.default_rng(seed)
+    durations = rng.integers(1, max_duration+1, n).astype(np.float64)
+    jobs = np.arange(1, n)
+    counts = rng.poisson(mean_predecessors, len(jobs))
+    targets = np.repeat(jobs, counts)
+    reach = np.minimum(targets, window)
+    sources = targets - 1 - (rng.random(len(targets)) * reach).astype(np.int64)
+    return (durations,) + _unique_edges(sources, targets, n)
+
+
+def series_parallel(n, parallel_probability=0.5, max_duration=10, seed=0) -> tuple:
+    '''
+    series-parallel network grown from one job: a random job is repeatedly either
+    followed by a new job that takes over its successors (series) or duplicated
+    with the same predecessors and successors (parallel)
+
+    returns: durations, precedence sources, precedence targets (job positions 0..n-1)
+    '''
+    rng = np.random.default_rng(seed)
+    durations = rng.integers(1, max_duration+1, n).astype(np.float64)
+    predecessors = [set() for _ in range(n)]
+    successors = [set() for _ in range(n)]
+    picks = rng.integers(0, np.arange(1, n)) if n > 1 else []
+    parallel = rng.random(n) < parallel_probability
+    for new, job in enumerate(np.asarray(picks).tolist(), 1):
+        if parallel[new]:
+            predecessors[new] = set(predecessors[job])
+            successors[new] = set(successors[job])
+            for predecessor in predecessors[new]:
+                successors[predecessor].add(new)
+            for successor in successors[new]:
+                predecessors[successor].add(new)
+        else:
+            successors[new] = successors[job]
+            for successor in successors[new]:
+                predecessors[successor].discard(job)
+                predecessors[successor].add(new)
+            successors[job] = {new}
+            predecessors[new] = {job}
+    sources = [predecessor for job in range(n) for predecessor in predecessors[job]]
+    targets = [job for job in range(n) for _ in predecessors[job]]
+    return durations, np.asarray(sources, dtype=np.int64), np.asarray(targets, dtype=np.int64)
+
+
+GENERATORS = {
+    'layered': layered_network,
+    'random_dag': random_dag,
+    'series_parallel': series_parallel,
+}
+
+
+def to_jobs(durations, sources, targets) -> dict:
+    '''
+    dictionary of Job objects (ids '0'..'n-1') for a generated network
+    '''
+    predecessors = [[] for _ in range(len(durations))]
+    for source, target in zip(sources.tolist(), targets.tolist()):
+        predecessors[target].append(str(source))
+    return {str(i): Job(str(i), duration, predecessors[i]) for i, duration in enumerate(durations.tolist())}
+
+
+def _unique_edges(sources, targets, n) -> tuple:
+    keys = np.unique(targets.astype(np.int64) * n + sources)
+    return keys % n, keys // n
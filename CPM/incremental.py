@@ -0,0 +1,209 @@
+import heapq
+from topology import CycleError
+
+
+class IncrementalCPM(object):
+    def __init__(self, network) -> None:
+        '''
+        Keeps the CPM times of a network up to date under edits, touching only
+        the jobs downstream (earliest times) or upstream (latest times) of a change.
+
+        Each job keeps its earliest start (head) and the length of the longest
+        path from its start to the end of the project (tail). Tails do not depend
+        on the makespan, so latest start = makespan - tail and
+        slack = makespan - tail - head.
+
+        parameters:
+        network: Network or CompiledNetwork.
+        '''
+        if not hasattr(network, 'forward_pass'):
+            network = network.compile()
+        earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, makespan = network.cpm()
+        n = len(network)
+        self.ids = list(network.ids)
+        self.index = dict(network.index)
+        self.durations = network.durations.tolist()
+        self.predecessors = [set(network.predecessors_of(i).tolist()) for i in range(n)]
+        self.successors = [set(network.successors_of(i).tolist()) for i in range(n)]
+        self.head = earliest_start_time.tolist()
+        self.tail = (makespan - latest_start_time).tolist()
+
+        # Topological position of each job, kept valid under edge insertions
+        self.position = [0] * n
+        for position, i in enumerate(network.order.tolist()):
+            self.position[i] = position
+
+        # Max-heap of finish times with lazy deletion of stale entries
+        self.finish_heap = [(-self.head[i] - self.durations[i], i) for i in range(n)]
+        heapq.heapify(self.finish_heap)
+
+    @property
+    def makespan(self) -> float:
+        heap = self.finish_heap
+        while heap and -heap[0][0] != self.head[heap[0][1]] + self.durations[heap[0][1]]:
+            heapq.heappop(heap)
+        return -heap[0][0] if heap else 0.0
+
+    def earliest_start(self, id) -> float:
+        return self.head[self.index[id]]
+
+    def latest_start(self, id) -> float:
+        return self.makespan - self.tail[self.index[id]]
+
+    def slack(self, id) -> float:
+        i = self.index[id]
+        return self.makespan - self.tail[i] - self.head[i]
+
+    def slacks(self) -> dict:
+        makespan = self.makespan
+        return {id: makespan - self.tail[i] - self.head[i] for i, id in enumerate(self.ids)}
+
+    def update(self, durations=None, add_edges=(), remove_edges=()) -> tuple:
+        '''
+        apply a batch of edits and propagate them.
+
+        parameters:
+        durations: dictionary of job id -> new duration.
+        add_edges, remove_edges: iterables of (predecessor id, successor id).
+
+        returns: slacks of the jobs whose earliest or latest times moved, and the
+        new makespan. If the makespan changed, the slack of every other job
+        moved by the same amount.
+        '''
+        forward_seeds = set()
+        backward_seeds = set()
+        # Resolve every job id before anything changes, so an unknown id leaves the network as it was
+        new_durations = [(self.index[id], duration) for id, duration in (durations or {}).items()]
+
+        removed = []
+        added = []
+        try:
+            for predecessor_id, successor_id in remove_edges:
+                u, v = self.index[predecessor_id], self.index[successor_id]
+                if v not in self.successors[u]:
+                    raise ValueError(f'no precedence {predecessor_id} -> {successor_id}')
+                self.successors[u].remove(v)
+                self.predecessors[v].remove(u)
+                removed.append((u, v))
+            for predecessor_id, successor_id in add_edges:
+                u, v = self.index[predecessor_id], self.index[successor_id]
+                if v in self.successors[u]:
+                    continue
+                self.__reorder(u, v)
+                self.successors[u].add(v)
+                self.predecessors[v].add(u)
+                added.append((u, v))
+        except Exception:
+            # Roll back the structural edits of this batch; the times are still untouched
+            for u, v in reversed(added):
+                self.successors[u].remove(v)
+                self.predecessors[v].remove(u)
+            for u, v in reversed(removed):
+                self.successors[u].add(v)
+                self.predecessors[v].add(u)
+            raise
+
+        for u, v in removed + added:
+            forward_seeds.add(v)
+            backward_seeds.add(u)
+        for i, duration in new_durations:
+            if self.durations[i] == duration:
+                continue
+            self.durations[i] = duration
+            heapq.heappush(self.finish_heap, (-self.head[i] - duration, i))
+            forward_seeds.update(self.successors[i])
+            backward_seeds.add(i)
+
+        changed = self.__propagate_forward(forward_seeds) | self.__propagate_backward(backward_seeds)
+        makespan = self.makespan
+        if len(self.finish_heap) > 4 * len(self.ids):
+            self.finish_heap = [(-self.head[i] - self.durations[i], i) for i in range(len(self.ids))]
+            heapq.heapify(self.finish_heap)
+        return {self.ids[i]: makespan - self.tail[i] - self.head[i] for i in changed}, makespan
+
+    def __propagate_forward(self, seeds) -> set:
+        '''
+        recompute earliest starts in topological order, stopping where they do not move
+        '''
+        changed = set()
+        heap = [(self.position[i], i) for i in seeds]
+        heapq.heapify(heap)
+        queued = set(seeds)
+        while heap:
+            _, i = heapq.heappop(heap)
+            queued.discard(i)
+            head = max((self.head[p] + self.durations[p] for p in self.predecessors[i]), default=0.0)
+            if head == self.head[i]:
+                continue
+            self.head[i] = head
+            changed.add(i)
+            heapq.heappush(self.finish_heap, (-head - self.durations[i], i))
+            for s in self.successors[i]:
+                if s not in queued:
+                    queued.add(s)
+                    heapq.heappush(heap, (self.position[s], s))
+        return changed
+
+    def __propagate_backward(self, seeds) -> set:
+        '''
+        recompute tails in reverse topological order, stopping where they do not move
+        '''
+        changed = set()
+        heap = [(-self.position[i], i) for i in seeds]
+        heapq.heapify(heap)
+        queued = set(seeds)
+        while heap:
+            _, i = heapq.heappop(heap)
+            queued.discard(i)
+            tail = self.durations[i] + max((self.tail[s] for s in self.successors[i]), default=0.0)
+            if tail == self.tail[i]:
+                continue
+            self.tail[i] = tail
+            changed.add(i)
+            for p in self.predecessors[i]:
+                if p not in queued:
+                    queued.add(p)
+                    heapq.heappush(heap, (-self.position[p], p))
+        return changed
+
+    def __reorder(self, u, v) -> None:
+        '''
+        Pearce-Kelly: restore a topological order before inserting u -> v
+        '''
+        lower, upper = self.position[v], self.position[u]
+        if lower > upper:
+            return
+
+        # Jobs reachable from v that currently sit before u
+        forward = []
+        stack = [v]
+        visited = {v}
+        while stack:
+            i = stack.pop()
+            if i == u:
+                raise CycleError([self.ids[u], self.ids[v]])
+            forward.append(i)
+            for s in self.successors[i]:
+                if s not in visited and self.position[s] <= upper:
+                    visited.add(s)
+                    stack.append(s)
+
+        # Jobs reaching u that currently sit after v
+        backward = []
+        stack = [u]
+        visited = {u}
+        while stack:
+            i = stack.pop()
+            backward.append(i)
+            for p in self.predecessors[i]:
+                if p not in visited and self.position[p] >= lower:
+                    visited.add(p)
+                    stack.append(p)
+
+        # Move the ancestors of u in front of the descendants of v, reusing their slots
+        backward.sort(key=self.position.__getitem__)
+        forward.sort(key=self.position.__getitem__)
+        jobs = backward + forward
+        slots = sorted(self.position[i] for i in jobs)
+        for i, slot in zip(jobs, slots):
+            self.position[i] = slot
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import networkx as nx
+from networkx.drawing.nx_agraph import graphviz_layout
+from matplotlib.figure import Figure
+
+
+def graph_key(graph) -> str:
+    '''
+    hash of the structure of a graph (node names and edges), independent of
+    labels, durations and insertion order
+    '''
+    nodes = sorted(str(node) for node in graph.nodes())
+    edges = sorted((str(u), str(v)) for u, v in graph.edges())
+    return hashlib.sha1(json.dumps([nodes, edges]).encode('utf-8')).hexdigest()
+
+
+class LayoutCache(object):
+    def __init__(self, directory=None) -> None:
+        '''
+        Node positions keyed by graph structure, so that graphs rendered again
+        with new durations or labels skip the layout.
+
+        parameters:
+        directory: if given, layouts are also kept there as json files and
+            shared between runs and processes.
+        '''
+        self.directory = directory
+        self.layouts = {}
+
+    def get(self, graph):
+        key = graph_key(graph)
+        positions = self.layouts.get(key)
+        if positions is None and self.directory is not None:
+            path = os.path.join(self.directory, key+'.json')
+            if os.path.exists(path):
+                with open(path) as file:
+                    positions = self.layouts[key] = json.load(file)
+        if positions is None:
+            return None
+        return {node: tuple(positions[str(node)]) for node in graph.nodes()}
+
+    def put(self, graph, pos) -> None:
+        key = graph_key(graph)
+        positions = self.layouts[key] = {str(node): [float(x), float(y)] for node, (x, y) in pos.items()}
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, key+'.json'), 'w') as file:
+                json.dump(positions, file)
+
+
+# Layouts of the current process, used when no cache is passed
+DEFAULT_CACHE = LayoutCache()
+
+# Largest graph laid out by dot and drawn in full detail. Larger graphs get the level
+# layout, and are drawn without edge labels and with plain lines instead of arrow
+# patches, which would otherwise take most of the rendering time
+MAX_DOT_NODES = 300
+
+
+def detailed(graph, max_dot_nodes=MAX_DOT_NODES) -> bool:
+    '''
+    whether graph is small enough to draw with arrows and edge labels
+    '''
+    return graph.number_of_nodes() <= max_dot_nodes
+
+
+def level_layout(graph) -> dict:
+    '''
+    left-to-right layout from the topological ranks: x is the level of a node,
+    and the nodes of a level are stacked around y = 0 in the order of the mean
+    position of their predecessors, which removes most edge crossings
+    '''
+    pos = {}
+    for level, nodes in enumerate(nx.topological_generations(graph)):
+        def barycenter(node):
+            ys = [pos[predecessor][1] for predecessor in graph.predecessors(node)]
+            return -sum(ys)/len(ys) if ys else 0.0
+        nodes = sorted(sorted(nodes, key=str), key=barycenter)
+        for k, node in enumerate(nodes):
+            pos[node] = (float(level), (len(nodes)-1)/2 - k)
+    return pos
+
+
+def compute_layout(graph, cache=DEFAULT_CACHE, max_dot_nodes=MAX_DOT_NODES) -> dict:
+    '''
+    node positions for a DAG: from the cache when the structure was laid out before,
+    otherwise graphviz dot for small graphs and the level layout for large ones
+    or when pygraphviz is not installed
+
+    parameters:
+    cache: LayoutCache, or None to always lay out again.
+    max_dot_nodes: largest graph handed to dot.
+    '''
+    if cache is not None:
+        pos = cache.get(graph)
+        if pos is not None:
+            return pos
+    pos = None
+    if detailed(graph, max_dot_nodes):
+        try:
+            pos = graphviz_layout(graph, prog='dot')
+        except ImportError:
+            pass
+    if pos is None:
+        pos = level_layout(graph)
+    if cache is not None:
+        cache.put(graph, pos)
+    return pos
+
+
+def new_figure(show=True, figsize=(12, 6)):
+    '''
+    figure to draw on; without show it is a standalone Figure that never touches
+    pyplot or a display, so batch rendering does not accumulate open figures
+    '''
+    if show:
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+    return Figure(figsize=figsize)
+
+
+def save_figure(figure, path, format='png', show=True) -> str:
+    '''
+    save figure to path + '.' + format (png through Agg, svg, pdf, ...) and show it if asked
+
+    returns: path of the written file
+    '''
+    path = f'{path}.{format}'
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    figure.savefig(path, format=format)
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+    return path
@@ -0,0 +1,150 @@
+import csv
+from array import array
+from compiled import CompiledNetwork
+
+
+def parse_predecessors(cell) -> list:
+    '''
+    parse a predecessors cell such as "[5, 6]" or "[]" into a list of ids
+    '''
+    cell = cell.strip().lstrip('[').rstrip(']')
+    return [id.strip().strip('\'"') for id in cell.split(',') if id.strip()]
+
+
+def number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def read_rows(path):
+    '''
+    stream the rows of a job csv file (id, predecessors and numeric columns such as duration)
+
+    yields: dictionary per row with a string id, a list of predecessor ids and numbers for the rest
+    '''
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        header = [column.strip() for column in next(reader)]
+        for row in reader:
+            if not row:
+                continue
+            data = {}
+            for column, cell in zip(header, row):
+                if column == 'id':
+                    data[column] = cell.strip()
+                elif column == 'predecessors':
+                    data[column] = parse_predecessors(cell)
+                else:
+                    data[column] = number(cell)
+            yield data
+
+
+class _Interner(object):
+    '''
+    assigns job positions in order of first appearance, as job or as predecessor
+    '''
+    def __init__(self) -> None:
+        self.index = {}
+        self.ids = []
+        self.durations = array('d')
+        self.defined = array('b')
+
+    def __call__(self, id) -> int:
+        i = self.index.get(id)
+        if i is None:
+            i = self.index[id] = len(self.ids)
+            self.ids.append(id)
+            self.durations.append(0.0)
+            self.defined.append(0)
+        return i
+
+    def define(self, id, duration) -> None:
+        i = self(id)
+        self.durations[i] = duration
+        self.defined[i] = 1
+
+    def compile(self, sources, targets) -> CompiledNetwork:
+        undefined = [id for id, defined in zip(self.ids, self.defined) if not defined]
+        if undefined:
+            raise ValueError(f'predecessors {undefined} are not defined as jobs')
+        return CompiledNetwork.from_edges(self.ids, self.durations, sources, targets)
+
+
+def load_csv(path) -> CompiledNetwork:
+    '''
+    stream an id/duration/predecessors csv file straight into a CompiledNetwork
+    '''
+    jobs = _Interner()
+    sources = array('i')
+    targets = array('i')
+    with open(path, newline='') as file:
+        reader = csv.reader(file)
+        header = [column.strip() for column in next(reader)]
+        id_column, duration_column, predecessors_column = (header.index(column) for column in ('id', 'duration', 'predecessors'))
+        for row in reader:
+            if not row:
+                continue
+            id = row[id_column].strip()
+            jobs.define(id, float(row[duration_column]))
+            target = jobs(id)
+            for predecessor in parse_predecessors(row[predecessors_column]):
+                sources.append(jobs(predecessor))
+                targets.append(target)
+    return jobs.compile(sources, targets)
+
+
+def load_edge_list(path) -> CompiledNetwork:
+    '''
+    stream a compact edge-list file into a CompiledNetwork.
+    The file holds one record per line, separated by whitespace:
+        j <id> <duration>           a job
+        e <predecessor> <successor> a precedence
+    Blank lines and lines starting with # are skipped; records may come in any order.
+    '''
+    jobs = _Interner()
+    sources = array('i')
+    targets = array('i')
+    with open(path) as file:
+        for line_number, line in enumerate(file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if fields[0] == 'j' and len(fields) == 3:
+                jobs.define(fields[1], float(fields[2]))
+            elif fields[0] == 'e' and len(fields) == 3:
+                sources.append(jobs(fields[1]))
+                targets.append(jobs(fields[2]))
+            else:
+                raise ValueError(f'{path}:{line_number}: unrecognized record {line.strip()!r}')
+    return jobs.compile(sources, targets)
+
+
+def write_csv(network: CompiledNetwork, path) -> None:
+    '''
+    write a CompiledNetwork in the id/duration/predecessors csv format
+    '''
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file, lineterminator='\n')
+        writer.writerow(['id', 'duration', 'predecessors'])
+        for i, id in enumerate(network.ids):
+            predecessors = ', '.join(network.ids[p] for p in network.predecessors_of(i).tolist())
+            writer.writerow([id, format_number(network.durations[i]), f'[{predecessors}]'])
+
+
+def write_edge_list(network: CompiledNetwork, path) -> None:
+    '''
+    write a CompiledNetwork in the compact edge-list format read by load_edge_list
+    '''
+    with open(path, 'w') as file:
+        for i, id in enumerate(network.ids):
+            file.write(f'j {id} {format_number(network.durations[i])}\n')
+        for i, id in enumerate(network.ids):
+            for p in network.predecessors_of(i).tolist():
+                file.write(f'e {network.ids[p]} {id}\n')
+
+
+def format_number(value) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
@@ -1,9 +1,8 @@
-import pandas as pd
 import sys
-import ast
 from os.path import realpath, dirname
 from visualize import *
 from CPM import *
+from loader import read_rows
 
 def main():
     inputpath = dirname(realpath(__file__))+'/input/example.csv'
@@ -16,24 +15,11 @@ def main():
     if len(sys.argv) > 3:
         mode = sys.argv[3]
 
-    df = pd.read_csv(inputpath)
-
-    # Convert the "predecessors" column to a list
-    df['predecessors'] = df['predecessors'].apply(ast.literal_eval)
-    df['id'] = df['id'].apply(str)
-
-    # Convert the DataFrame to a dictionary
-    jobs_dict = df.to_dict('index')
-    
-    # Convert the keys to 'id'
-    jobs_dict = {value['id']: value for key, value in jobs_dict.items()}
-
-    # Convert the dictionary to Job objects
-    jobs = {id: Job(**job_data) for id, job_data in jobs_dict.items()}
-
+    # Stream the csv rows straight into Job objects
+    jobs = {row['id']: Job(**row) for row in read_rows(inputpath)}
 
     # Create the network and add jobs and dependencies
-    network = Network(jobs)
+    network = Network(jobs, lazy_paths=True, max_critical_paths=MAX_CRITICAL_PATHS)
 
     # Run the CPM algorithm
     CPM_results = CPM(network)
@@ -0,0 +1,89 @@
+import heapq
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from compiled import CompiledNetwork
+from topology import connected_components
+
+
+def portfolio_CPM(network, processes=None, tasks_per_process=4) -> tuple:
+    '''
+    Runs CPM on a portfolio of independent subprojects (weakly connected
+    components) across a process pool. Every subproject is scheduled against
+    its own makespan.
+
+    parameters:
+    network: Network or CompiledNetwork.
+    processes: number of worker processes, os.cpu_count() by default; 1 runs in this process.
+    tasks_per_process: number of component batches handed to each worker, for load balancing.
+
+    returns: portfolio makespan, component label per job, makespan per component,
+    earliest start times, latest start times, slacks (per-job arrays follow network.compile().ids)
+    '''
+    if not hasattr(network, 'forward_pass'):
+        network = network.compile()
+    n = len(network)
+    sources = network.pred_indices
+    targets = np.repeat(np.arange(n, dtype=np.int32), np.diff(network.pred_indptr))
+    components = np.asarray(connected_components(n, sources.tolist(), targets.tolist()), dtype=np.int64)
+    count = int(components.max()) + 1 if n else 0
+    sizes = np.bincount(components, minlength=count)
+
+    # Spread the components over the tasks, largest first onto the least loaded task
+    processes = processes or os.cpu_count() or 1
+    task_count = max(1, min(count, processes * tasks_per_process))
+    loads = [(0, task) for task in range(task_count)]
+    task_of_component = np.zeros(count, dtype=np.int64)
+    for component in np.argsort(-sizes, kind='stable').tolist():
+        load, task = heapq.heappop(loads)
+        task_of_component[component] = task
+        heapq.heappush(loads, (load + int(sizes[component]), task))
+
+    # Jobs and edges of each task, renumbered locally
+    task_of_job = task_of_component[components]
+    members = np.argsort(task_of_job, kind='stable')
+    job_bounds = np.searchsorted(task_of_job[members], np.arange(task_count+1))
+    local = np.empty(n, dtype=np.int32)
+    local[members] = np.arange(n) - job_bounds[task_of_job[members]]
+    task_of_edge = task_of_job[targets]
+    edges = np.argsort(task_of_edge, kind='stable')
+    edge_bounds = np.searchsorted(task_of_edge[edges], np.arange(task_count+1))
+
+    payloads = []
+    for task in range(task_count):
+        jobs = members[job_bounds[task]:job_bounds[task+1]]
+        task_edges = edges[edge_bounds[task]:edge_bounds[task+1]]
+        payloads.append((network.durations[jobs], local[sources[task_edges]], local[targets[task_edges]], components[jobs]))
+
+    if processes == 1 or task_count == 1:
+        results = [solve_subprojects(*payload) for payload in payloads]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(solve_subprojects, *zip(*payloads)))
+
+    # Merge the task results back into portfolio-level arrays
+    earliest_start_time = np.zeros(n)
+    latest_start_time = np.zeros(n)
+    component_makespans = np.zeros(count)
+    for task, (task_earliest, task_latest, task_components, task_makespans) in enumerate(results):
+        jobs = members[job_bounds[task]:job_bounds[task+1]]
+        earliest_start_time[jobs] = task_earliest
+        latest_start_time[jobs] = task_latest
+        component_makespans[task_components] = task_makespans
+    makespan = component_makespans.max(initial=0.0)
+    slacks = latest_start_time - earliest_start_time
+    return makespan, components, component_makespans, earliest_start_time, latest_start_time, slacks
+
+
+def solve_subprojects(durations, sources, targets, components) -> tuple:
+    '''
+    CPM for a batch of disjoint subprojects, each measured against its own makespan
+    '''
+    network = CompiledNetwork.from_edges(range(len(durations)), durations, sources, targets)
+    earliest_start_time, earliest_finish_time = network.forward_pass()
+    labels, local_components = np.unique(components, return_inverse=True)
+    makespans = np.zeros(len(labels))
+    np.maximum.at(makespans, local_components, earliest_finish_time)
+    latest_finish_time = -network.backward.relax(network.durations, np.maximum, -makespans[local_components])
+    latest_start_time = latest_finish_time - network.durations
+    return earliest_start_time, latest_start_time, labels, makespans
@@ -0,0 +1,221 @@
+from array import array
+import numpy as np
+from compiled import LevelSchedule, transpose
+from loader import _Interner, format_number
+from topology import CycleError, strongly_connected_components
+
+# Link types: which end of the predecessor constrains which end of the successor
+FS, SS, FF, SF = 0, 1, 2, 3
+LINK_TYPES = {'FS': FS, 'SS': SS, 'FF': FF, 'SF': SF}
+LINK_NAMES = {value: name for name, value in LINK_TYPES.items()}
+
+
+class PositiveCycleError(CycleError):
+    '''
+    the links contain a cycle of positive length, so no schedule satisfies them all
+    '''
+    def __init__(self, jobs) -> None:
+        self.jobs = list(jobs)
+        ValueError.__init__(self, f'links contain a positive cycle through jobs {self.jobs}')
+
+
+class PrecedenceNetwork(object):
+    def __init__(self, ids, durations, sources, targets, types=None, lags=None) -> None:
+        '''
+        CPM network with generalized precedence links, kept as typed edge arrays.
+        A link from p to s with lag L requires, by type,
+            FS: start(s) >= finish(p) + L      SS: start(s) >= start(p) + L
+            FF: finish(s) >= finish(p) + L     SF: finish(s) >= start(p) + L
+        Lags may be negative, and negative lags may close cycles as long as no cycle
+        has positive length; a positive cycle raises PositiveCycleError.
+
+        parameters:
+        ids, durations: job ids and durations by job position.
+        sources, targets: positions of the predecessor and successor of every link.
+        types: link type per link (FS, SS, FF, SF), FS by default.
+        lags: lag per link, 0 by default.
+        '''
+        self.ids = [str(id) for id in ids]
+        self.index = {id: i for i, id in enumerate(self.ids)}
+        self.durations = np.asarray(durations, dtype=np.float64)
+        self.link_sources = np.asarray(sources, dtype=np.int32)
+        self.link_targets = np.asarray(targets, dtype=np.int32)
+        m = len(self.link_sources)
+        self.link_types = np.zeros(m, dtype=np.int8) if types is None else np.asarray(types, dtype=np.int8)
+        self.link_lags = np.zeros(m, dtype=np.float64) if lags is None else np.asarray(lags, dtype=np.float64)
+        n = len(self.ids)
+
+        # Strongly connected components (cycles made possible by negative lags) are
+        # relaxed together; the components themselves form a DAG that is relaxed level by
+        # level. Acyclic networks, the usual case, skip the component search.
+        components = np.arange(n, dtype=np.int64)
+        try:
+            schedule = _condensation(components, n, self.link_sources, self.link_targets)
+        except CycleError:
+            components = np.asarray(strongly_connected_components(n, self.link_sources.tolist(), self.link_targets.tolist()), dtype=np.int64)
+            schedule = _condensation(components, int(components.max()) + 1, self.link_sources, self.link_targets)
+        count = len(schedule.order)
+        between = components[self.link_sources] != components[self.link_targets]
+        component_level = np.empty(count, dtype=np.int64)
+        component_level[schedule.order] = np.repeat(np.arange(len(schedule.level_indptr)-1), np.diff(schedule.level_indptr))
+        level = component_level[components]
+        levels = len(schedule.level_indptr) - 1
+
+        # Bellman-Ford rounds needed per level: one without inner links, otherwise
+        # one more than the largest component can take
+        sizes = np.bincount(components, minlength=count)
+        inner = np.bincount(component_level[components[self.link_sources[~between]]], minlength=levels) > 0
+        largest = np.zeros(levels, dtype=np.int64)
+        np.maximum.at(largest, component_level, sizes)
+        self.rounds = np.where(inner, largest + 1, 1)
+
+        # Links grouped by the level of their successor (forward) and predecessor (backward)
+        self.forward_links = np.argsort(level[self.link_targets], kind='stable')
+        self.forward_indptr = np.searchsorted(level[self.link_targets][self.forward_links], np.arange(levels+1))
+        self.backward_links = np.argsort(level[self.link_sources], kind='stable')
+        self.backward_indptr = np.searchsorted(level[self.link_sources][self.backward_links], np.arange(levels+1))
+
+    @classmethod
+    def from_links(cls, jobs, links) -> 'PrecedenceNetwork':
+        '''
+        parameters:
+        jobs: dictionary of job id -> duration.
+        links: iterable of (predecessor id, successor id, type, lag); type is a name
+            ('FS', 'SS', 'FF', 'SF') or constant, and type and lag may be left out.
+        '''
+        index = {str(id): i for i, id in enumerate(jobs)}
+        sources, targets, types, lags = array('i'), array('i'), array('b'), array('d')
+        for link in links:
+            predecessor, successor, kind, lag = (tuple(link) + ('FS', 0.0))[:4]
+            sources.append(index[str(predecessor)])
+            targets.append(index[str(successor)])
+            types.append(LINK_TYPES.get(kind, kind))
+            lags.append(lag)
+        return cls(index.keys(), list(jobs.values()), sources, targets, types, lags)
+
+    @classmethod
+    def from_network(cls, network) -> 'PrecedenceNetwork':
+        '''
+        finish-to-start network of a Network or CompiledNetwork
+        '''
+        if not hasattr(network, 'forward_pass'):
+            network = network.compile()
+        targets = np.repeat(np.arange(len(network), dtype=np.int32), np.diff(network.pred_indptr))
+        return cls(network.ids, network.durations, network.pred_indices, targets)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def weights(self, durations=None) -> np.ndarray:
+        '''
+        link lengths in start times: start(s) >= start(p) + weight
+        '''
+        if durations is None:
+            durations = self.durations
+        from_finish = (self.link_types == FS) | (self.link_types == FF)
+        to_finish = (self.link_types == FF) | (self.link_types == SF)
+        return self.link_lags + np.where(from_finish, durations[self.link_sources], 0.0) - np.where(to_finish, durations[self.link_targets], 0.0)
+
+    def forward_pass(self, durations=None) -> tuple:
+        '''
+        earliest start and finish times of every job, no job starting before 0
+        '''
+        if durations is None:
+            durations = self.durations
+        earliest_start_time = np.zeros(len(self.ids))
+        self.__relax(earliest_start_time, self.link_sources, self.link_targets, self.weights(durations), self.forward_links, self.forward_indptr, range(len(self.rounds)))
+        return earliest_start_time, earliest_start_time + durations
+
+    def backward_pass(self, makespan, durations=None) -> tuple:
+        '''
+        latest start and finish times of every job for the given makespan
+        '''
+        if durations is None:
+            durations = self.durations
+        # Relax the negated start times along the reversed links
+        negated = durations - makespan
+        self.__relax(negated, self.link_targets, self.link_sources, self.weights(durations), self.backward_links, self.backward_indptr, reversed(range(len(self.rounds))))
+        latest_start_time = -negated
+        return latest_start_time, latest_start_time + durations
+
+    def cpm(self, durations=None) -> tuple:
+        if durations is None:
+            durations = self.durations
+        earliest_start_time, earliest_finish_time = self.forward_pass(durations)
+        makespan = earliest_finish_time.max(initial=0.0)
+        latest_start_time, latest_finish_time = self.backward_pass(makespan, durations)
+        slacks = latest_start_time - earliest_start_time
+        return earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, makespan
+
+    def to_dict(self, values) -> dict:
+        return {id: value for id, value in zip(self.ids, values.tolist())}
+
+    def __relax(self, value, tails, heads, weights, links, indptr, levels) -> None:
+        # value[head] = max(value[head], value[tail] + weight), level by level; levels
+        # holding a cycle repeat Bellman-Ford rounds until nothing changes
+        for level in levels:
+            level_links = links[indptr[level]:indptr[level+1]]
+            if len(level_links) == 0:
+                continue
+            level_tails, level_heads, level_weights = tails[level_links], heads[level_links], weights[level_links]
+            rounds = self.rounds[level]
+            for _ in range(rounds):
+                before = value[level_heads]
+                np.maximum.at(value, level_heads, value[level_tails] + level_weights)
+                changed = value[level_heads] > before
+                if rounds == 1 or not changed.any():
+                    break
+            else:
+                raise PositiveCycleError(sorted({self.ids[i] for i in level_heads[changed].tolist()}))
+
+
+def _condensation(components, count, sources, targets) -> LevelSchedule:
+    # Level schedule of the graph between components, links inside a component left out
+    between = components[sources] != components[targets]
+    component_sources = components[sources[between]].astype(np.int32)
+    component_targets = components[targets[between]]
+    order = np.argsort(component_targets, kind='stable')
+    pred_indptr = np.concatenate(([0], np.cumsum(np.bincount(component_targets, minlength=count)))).astype(np.int64)
+    pred_indices = component_sources[order]
+    succ_indptr, succ_indices = transpose(pred_indptr, pred_indices, count)
+    return LevelSchedule(pred_indptr, pred_indices, succ_indptr, succ_indices, list(range(count)))
+
+
+def load_links(path) -> PrecedenceNetwork:
+    '''
+    stream an edge-list file with typed links into a PrecedenceNetwork.
+    Same records as loader.load_edge_list, links may add a type and a lag:
+        j <id> <duration>
+        e <predecessor> <successor> [FS|SS|FF|SF] [lag]
+    '''
+    jobs = _Interner()
+    sources, targets, types, lags = array('i'), array('i'), array('b'), array('d')
+    with open(path) as file:
+        for line_number, line in enumerate(file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if fields[0] == 'j' and len(fields) == 3:
+                jobs.define(fields[1], float(fields[2]))
+            elif fields[0] == 'e' and 3 <= len(fields) <= 5 and (len(fields) < 4 or fields[3] in LINK_TYPES):
+                sources.append(jobs(fields[1]))
+                targets.append(jobs(fields[2]))
+                types.append(LINK_TYPES[fields[3]] if len(fields) > 3 else FS)
+                lags.append(float(fields[4]) if len(fields) > 4 else 0.0)
+            else:
+                raise ValueError(f'{path}:{line_number}: unrecognized record {line.strip()!r}')
+    undefined = [id for id, defined in zip(jobs.ids, jobs.defined) if not defined]
+    if undefined:
+        raise ValueError(f'predecessors {undefined} are not defined as jobs')
+    return PrecedenceNetwork(jobs.ids, jobs.durations, sources, targets, types, lags)
+
+
+def write_links(network: PrecedenceNetwork, path) -> None:
+    '''
+    write a PrecedenceNetwork in the format read by load_links
+    '''
+    with open(path, 'w') as file:
+        for i, id in enumerate(network.ids):
+            file.write(f'j {id} {format_number(network.durations[i])}\n')
+        for source, target, kind, lag in zip(network.link_sources.tolist(), network.link_targets.tolist(), network.link_types.tolist(), network.link_lags.tolist()):
+            file.write(f'e {network.ids[source]} {network.ids[target]} {LINK_NAMES[kind]} {format_number(lag)}\n')
@@ -0,0 +1,207 @@
+import heapq
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+
+class ResourceProfile(object):
+    def __init__(self, capacity) -> None:
+        '''
+        Skyline of the usage of one resource over time: usage[k] units are in use
+        on [times[k], times[k+1]), and the last segment is idle up to infinity.
+
+        parameters:
+        capacity: units of the resource available at any time.
+        '''
+        self.capacity = capacity
+        self.times = [0.0]
+        self.usage = [0]
+
+    def earliest_fit(self, start, duration, demand) -> float:
+        '''
+        earliest time from start on at which demand units stay free for duration
+        '''
+        if demand == 0 or duration == 0:
+            return start
+        limit = self.capacity - demand
+        times, usage = self.times, self.usage
+        last = len(times) - 1
+        finish = start + duration
+        k = bisect_right(times, start) - 1
+        # Single sweep: an overloaded segment pushes the start past its end
+        while k < last and times[k] < finish:
+            if usage[k] > limit:
+                start = times[k+1]
+                finish = start + duration
+            k += 1
+        return start
+
+    def reserve(self, start, finish, demand) -> None:
+        if demand == 0 or finish <= start:
+            return
+        first = self.__breakpoint(start)
+        last = self.__breakpoint(finish)
+        usage = self.usage
+        for k in range(first, last):
+            usage[k] += demand
+
+    def __breakpoint(self, time) -> int:
+        k = bisect_left(self.times, time)
+        if k < len(self.times) and self.times[k] == time:
+            return k
+        self.times.insert(k, time)
+        self.usage.insert(k, self.usage[k-1])
+        return k
+
+
+class ResourceScheduler(object):
+    def __init__(self, network, demands, capacities, priorities=None) -> None:
+        '''
+        Resource-constrained scheduling on top of the CPM network with priority-rule
+        schedule generation schemes.
+
+        parameters:
+        network: Network or CompiledNetwork.
+        demands: dictionary of job id -> {resource: units}; jobs missing here use no resources.
+        capacities: dictionary of resource -> units available.
+        priorities: dictionary of job id -> priority, lower goes first;
+            by default total slack from CPM, ties broken by earliest start.
+        '''
+        if not hasattr(network, 'forward_pass'):
+            network = network.compile()
+        self.network = network
+        n = len(network)
+        self.durations = network.durations.tolist()
+        self.predecessors = [network.predecessors_of(i).tolist() for i in range(n)]
+        self.successors = [network.successors_of(i).tolist() for i in range(n)]
+        self.capacities = dict(capacities)
+        self.demands = [[] for _ in range(n)]
+        for id, demand in demands.items():
+            for resource, units in demand.items():
+                if units > self.capacities[resource]:
+                    raise ValueError(f'job {id} needs {units} of {resource}, capacity is {self.capacities[resource]}')
+                if units > 0:
+                    self.demands[network.index[id]].append((resource, units))
+
+        if priorities is None:
+            earliest_start_time, _, _, _, slacks, _ = network.cpm()
+            self.priorities = list(zip(slacks.tolist(), earliest_start_time.tolist(), range(n)))
+        else:
+            self.priorities = [(priorities[id], i) for i, id in enumerate(network.ids)]
+
+    def serial(self) -> tuple:
+        '''
+        serial SGS: take eligible jobs in priority order and start each at the
+        earliest precedence- and resource-feasible time
+
+        returns: start times, finish times (arrays in network.ids order), makespan
+        '''
+        n = len(self.durations)
+        profiles = {resource: ResourceProfile(capacity) for resource, capacity in self.capacities.items()}
+        remaining = [len(predecessors) for predecessors in self.predecessors]
+        eligible = [(self.priorities[i], i) for i in range(n) if remaining[i] == 0]
+        heapq.heapify(eligible)
+        start_times = [0.0] * n
+        finish_times = [0.0] * n
+        while eligible:
+            _, i = heapq.heappop(eligible)
+            start = max((finish_times[p] for p in self.predecessors[i]), default=0.0)
+            start = self.__earliest_fit(profiles, i, start)
+            self.__schedule(profiles, i, start, start_times, finish_times)
+            for s in self.successors[i]:
+                remaining[s] -= 1
+                if remaining[s] == 0:
+                    heapq.heappush(eligible, (self.priorities[s], s))
+        return self.__results(start_times, finish_times)
+
+    def parallel(self) -> tuple:
+        '''
+        parallel SGS: advance a decision time over finish events and, at each one,
+        start every eligible job that fits, in priority order.
+        Every job starts at the decision time and nothing is ever booked later than
+        that, so usage can only fall after it and the units free right now decide.
+
+        returns: start times, finish times (arrays in network.ids order), makespan
+        '''
+        n = len(self.durations)
+        available = dict(self.capacities)
+        # Zero-duration jobs hold no units, as in the serial scheme
+        demands = [demand if duration else [] for demand, duration in zip(self.demands, self.durations)]
+        # Jobs that did not fit wait, in priority heaps, on the first resource that was
+        # short, grouped by the units they need of it
+        blocked = {resource: {} for resource in self.capacities}
+        remaining = [len(predecessors) for predecessors in self.predecessors]
+        eligible = [(self.priorities[i], i) for i in range(n) if remaining[i] == 0]
+        events = []
+        start_times = [0.0] * n
+        finish_times = [0.0] * n
+        time = 0.0
+        while True:
+            # Merge the newly eligible jobs with every group that may fit now, in priority order.
+            # Capacity only shrinks while the decision time stays, so a group whose head is
+            # short of the group's own resource is done until the next event.
+            heapq.heapify(eligible)
+            queues = [eligible] + [queue for resource, waiting in blocked.items()
+                                   for units, queue in waiting.items() if queue and units <= available[resource]]
+            heads = [(queue[0], k) for k, queue in enumerate(queues) if queue]
+            heapq.heapify(heads)
+            while heads:
+                _, k = heapq.heappop(heads)
+                queue = queues[k]
+                priority, i = queue[0]
+                short = next(((resource, units) for resource, units in demands[i] if available[resource] < units), None)
+                if short is None:
+                    heapq.heappop(queue)
+                    start_times[i] = time
+                    finish_times[i] = time + self.durations[i]
+                    for resource, units in demands[i]:
+                        available[resource] -= units
+                    heapq.heappush(events, (finish_times[i], i))
+                else:
+                    resource, units = short
+                    group = blocked[resource].setdefault(units, [])
+                    if group is queue:
+                        continue
+                    heapq.heappop(queue)
+                    heapq.heappush(group, (priority, i))
+                if queue:
+                    heapq.heappush(heads, (queue[0], k))
+
+            # Move to the next finish event, free its units and release the successors
+            if not events:
+                break
+            eligible = []
+            time = events[0][0]
+            while events and events[0][0] == time:
+                _, i = heapq.heappop(events)
+                for resource, units in demands[i]:
+                    available[resource] += units
+                for s in self.successors[i]:
+                    remaining[s] -= 1
+                    if remaining[s] == 0:
+                        eligible.append((self.priorities[s], s))
+        return self.__results(start_times, finish_times)
+
+    def __earliest_fit(self, profiles, i, start) -> float:
+        # Cycle through the resources until all of them accept the same start
+        demands = self.demands[i]
+        duration = self.durations[i]
+        accepted = 0
+        k = 0
+        while accepted < len(demands):
+            resource, units = demands[k]
+            fit = profiles[resource].earliest_fit(start, duration, units)
+            accepted = 1 if fit > start else accepted + 1
+            start = fit
+            k = (k + 1) % len(demands)
+        return start
+
+    def __schedule(self, profiles, i, start, start_times, finish_times) -> None:
+        start_times[i] = start
+        finish_times[i] = start + self.durations[i]
+        for resource, units in self.demands[i]:
+            profiles[resource].reserve(start, finish_times[i], units)
+
+    @staticmethod
+    def __results(start_times, finish_times) -> tuple:
+        finish_times = np.array(finish_times)
+        return np.array(start_times), finish_times, finish_times.max(initial=0.0)
@@ -0,0 +1,41 @@
+import numpy as np
+
+
+def scenario_CPM(network, durations, batch_size=1024, tolerance=1e-9, return_times=True) -> tuple:
+    '''
+    Runs CPM on the same precedence graph for many duration vectors at once.
+
+    parameters:
+    network: Network or CompiledNetwork.
+    durations: (S x N) matrix, row s holds the durations of scenario s,
+        columns follow the job order of the compiled network (network.compile().ids).
+    batch_size: number of scenarios passed through the network together.
+    tolerance: slack at or below which a job counts as critical.
+    return_times: if False, do not keep the (S x N) time matrices.
+
+    returns: makespans (S), earliest start times (S x N), latest start times (S x N),
+    criticality (N), the fraction of scenarios in which each job is critical
+    '''
+    if not hasattr(network, 'forward_pass'):
+        network = network.compile()
+    durations = np.atleast_2d(np.asarray(durations, dtype=np.float64))
+    if durations.shape[1] != len(network):
+        raise ValueError(f'expected {len(network)} durations per scenario, got {durations.shape[1]}')
+
+    scenarios = durations.shape[0]
+    makespans = np.empty(scenarios)
+    earliest_start_times = np.empty(durations.shape) if return_times else None
+    latest_start_times = np.empty(durations.shape) if return_times else None
+    critical_counts = np.zeros(len(network), dtype=np.int64)
+
+    for start in range(0, scenarios, batch_size):
+        batch = slice(start, start+batch_size)
+        earliest_start_time, _, latest_start_time, _, slacks, makespan = network.cpm(durations[batch])
+        makespans[batch] = makespan
+        critical_counts += np.count_nonzero(slacks <= tolerance, axis=0)
+        if return_times:
+            earliest_start_times[batch] = earliest_start_time
+            latest_start_times[batch] = latest_start_time
+
+    criticality = critical_counts / max(scenarios, 1)
+    return makespans, earliest_start_times, latest_start_times, criticality
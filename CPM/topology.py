@@ -0,0 +1,160 @@
+import re
+from collections import deque
+
+# Integer job ids: ASCII digits with an optional minus sign
+NUMERIC_ID = re.compile(r'-?[0-9]+')
+
+
+class CycleError(ValueError):
+    def __init__(self, jobs) -> None:
+        '''
+        parameters:
+        jobs: ids of the jobs that lie on, or wait behind, a precedence cycle.
+        '''
+        self.jobs = list(jobs)
+        super().__init__(f'network contains a cycle through jobs {self.jobs}')
+
+
+def id_key(id) -> tuple:
+    '''
+    sort key for job ids: numeric ids in numeric order, then the others alphabetically
+    '''
+    id = str(id)
+    value = numeric_id(id)
+    if value is not None:
+        return (0, value, id)
+    return (1, 0, id)
+
+
+def numeric_id(id):
+    '''
+    returns: the integer value of a numeric job id, None for any other id
+    '''
+    return int(id) if NUMERIC_ID.fullmatch(id) else None
+
+
+def topological_sort(jobs, successors) -> tuple:
+    '''
+    Kahn's algorithm over integer job positions, shared by the CPM, PERT and
+    Time/Cost Trade-Off networks.
+
+    parameters:
+    jobs: list of jobs.
+    successors: mapping from job id to the list of its successor jobs.
+
+    returns: sources (in input order), sinks (in sorted order), sorted jobs
+    '''
+    index = {job.id: i for i, job in enumerate(jobs)}
+    out_edges = [[index[successor.id] for successor in successors.get(job.id, ())] for job in jobs]
+
+    # Calculate in-degree for each job
+    in_degree = [0] * len(jobs)
+    for targets in out_edges:
+        for target in targets:
+            in_degree[target] += 1
+
+    is_source = [degree == 0 for degree in in_degree]
+    is_sink = [len(targets) == 0 for targets in out_edges]
+    queue = deque(i for i in range(len(jobs)) if is_source[i])
+    sorted_order = []
+
+    # Perform topological sort
+    while queue:
+        i = queue.popleft()
+        sorted_order.append(i)
+
+        # Decrement the in-degree of each successor and queue it once it becomes 0
+        for target in out_edges[i]:
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                queue.append(target)
+
+    if len(sorted_order) < len(jobs):
+        raise CycleError(jobs[i].id for i in range(len(jobs)) if in_degree[i] > 0)
+
+    sources = [job for job, source in zip(jobs, is_source) if source]
+    sinks = [jobs[i] for i in sorted_order if is_sink[i]]
+    return sources, sinks, [jobs[i] for i in sorted_order]
+
+
+
+def connected_components(n, sources, targets) -> list:
+    '''
+    label the weakly connected components of a graph with n jobs, given its
+    edges as parallel sequences of job positions.
+
+    returns: component label per job position, numbered 0, 1, ... in order of first appearance
+    '''
+    parent = list(range(n))
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for u, v in zip(sources, targets):
+        root_u, root_v = find(u), find(v)
+        if root_u != root_v:
+            parent[max(root_u, root_v)] = min(root_u, root_v)
+
+    labels = [0] * n
+    numbering = {}
+    for i in range(n):
+        labels[i] = numbering.setdefault(find(i), len(numbering))
+    return labels
+
+
+def strongly_connected_components(n, sources, targets) -> list:
+    '''
+    label the strongly connected components of a graph with n jobs, given its
+    edges as parallel sequences of job positions (iterative Tarjan).
+
+    returns: component label per job position; every edge goes from a higher or
+    equal label to a lower or equal one, so descending labels are a topological order
+    '''
+    out_edges = [[] for _ in range(n)]
+    for u, v in zip(sources, targets):
+        out_edges[u].append(v)
+
+    index = [-1] * n
+    low = [0] * n
+    labels = [-1] * n
+    stack = []
+    counter = 0
+    count = 0
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        work = [(root, 0)]
+        while work:
+            i, k = work[-1]
+            if k < len(out_edges[i]):
+                work[-1] = (i, k+1)
+                j = out_edges[i][k]
+                if index[j] < 0:
+                    index[j] = low[j] = counter
+                    counter += 1
+                    stack.append(j)
+                    work.append((j, 0))
+                elif labels[j] < 0 and index[j] < low[i]:
+                    low[i] = index[j]
+                continue
+            work.pop()
+            if work and low[i] < low[work[-1][0]]:
+                low[work[-1][0]] = low[i]
+            if low[i] == index[i]:
+                # i is the root of a component: pop it off the stack
+                while True:
+                    j = stack.pop()
+                    labels[j] = count
+                    if j == i:
+                        break
+                count += 1
+    return labels
@@ -1,10 +1,10 @@
 import networkx as nx
-import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
 import os
-from networkx.drawing.nx_agraph import graphviz_layout
 from collections import defaultdict
 from CPM import *
+from aoa import build_AOA, event_times
+from layout import DEFAULT_CACHE, compute_layout, detailed, new_figure, save_figure
 DEAFULT_PATH = os.path.dirname(os.path.realpath(__file__))+'/output'
 
 # Define a class State to represent each state with its incoming and outgoing jobs
@@ -71,7 +71,7 @@ class State(object):
         return False
     
     def __hash__(self) -> int:
-        return int(self.id)
+        return hash(self.id)
 
     
 class StateAssembler(object):
@@ -155,108 +155,98 @@ class StateAssembler(object):
         return shared_outgoing
 
 
-def visualize_CPM(jobs: dict, CPM_results: tuple, network: Network, outputpath: str=DEAFULT_PATH, mode='joa') -> None:
+# Diagram modes of visualize_CPM: job on arc, job on node
+MODES = ('joa', 'job_on_arc', 'jon', 'job_on_node')
+def visualize_CPM(jobs: dict, CPM_results: tuple, network: Network, outputpath: str=DEAFULT_PATH, mode='joa',
+                  show: bool=True, format: str='png', layout_cache=DEFAULT_CACHE) -> str:
+    '''
+    draw the network and save it to outputpath/CPM.<format>
+
+    parameters:
+    mode: 'joa' or 'job_on_arc' for events joined by job arcs, 'jon' or 'job_on_node'
+        for jobs as nodes.
+    show: open a window with the figure; with False nothing touches pyplot or a display,
+        for batch rendering.
+    format: output format, e.g. 'png' or 'svg'.
+    layout_cache: LayoutCache reusing node positions of networks with the same structure,
+        None to lay out every time.
+
+    returns: path of the saved image
+    '''
+    if mode not in MODES:
+        raise ValueError(f'unknown mode {mode!r}, expected one of {list(MODES)}')
     earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, critical_path, makespan = CPM_results
-    critical_paths = network.critical_paths
     if mode == 'joa' or mode == 'job_on_arc':
-        # Create a dictionary to store all states
-        states = {'0': State('0', is_critical=True)}
-
-        # Add jobs with no predecessors starting from "state 0"
-        for job in network.sources:
-            states['0'].add_outgoing(job)
-
-        # Add the rest of the jobs
-        for job in jobs.values():
-            is_critical = False
-            if job in critical_path:
-                is_critical = True
-            states[job.id] = State(job.id, is_critical)
-            states[job.id].add_incoming(job)
-        for job in jobs.values():
-            for predecessor_id in job.predecessors:
-                states[predecessor_id].add_outgoing(job)
-
-        state_assembler = StateAssembler(states)
-        states = state_assembler(jobs, critical_path)
+        # Build the job-on-arc network; events are numbered in topological order
+        event_count, arcs = build_AOA(network)
+        durations = {job.id: job.duration for job in jobs.values()}
+        earliest_event_time, latest_event_time = event_times(event_count, arcs, durations)
+        critical_events = {event for event in range(event_count) if earliest_event_time[event] == latest_event_time[event]}
 
         # Create a directed graph
         graph = nx.DiGraph()
 
         graph.graph['graph'] = {'rankdir': 'LR'}
 
-        for state in states.values():
-            if state.id == '0':
-                graph.add_node(state, label='0/0')
+        for event in range(event_count):
+            graph.add_node(event, label=f'{earliest_event_time[event]}/{latest_event_time[event]}')
+
+        # Add edges based on the arcs; a dummy is critical when it takes no float between critical events
+        for tail, head, job_id in arcs:
+            if job_id is not None:
+                job = jobs[job_id]
+                graph.add_edge(tail, head, label=f"J{str(job)}: {job.duration}", is_critical=(job in critical_path), is_dummy=False)
             else:
-                eft, lft = state.done_time(earliest_finish_time, latest_finish_time)
-                graph.add_node(state, label=f'{eft}/{lft}')
-
-        # Add edges based on the states
-        for state in states.values():
-            for outgoing in state.outgoing:
-                if not outgoing.is_dummy:
-                    graph.add_edge(state, states[outgoing.id], label=f"J{str(outgoing)}: {outgoing.duration}", is_critical=(outgoing in critical_path), is_dummy=False)
-                else:
-                    truth = [False, False]
-                    out_state = states[outgoing.id]
-                    for path in critical_paths:
-                        truth = [False, False]
-                        for incoming in state.incoming:
-                            if incoming in path:
-                                truth[0] = True
-                        for outgoing in out_state.outgoing:
-                            if outgoing in path:
-                                truth[1] = True
-                        if truth[0] and truth[1]:
-                            break
-                    graph.add_edge(state, out_state, label='D: 0', is_critical=(truth[0] and truth[1]), is_dummy=True)
+                is_critical = tail in critical_events and head in critical_events and earliest_event_time[tail] == earliest_event_time[head]
+                graph.add_edge(tail, head, label='D: 0', is_critical=is_critical, is_dummy=True)
         # Draw the graph
-        plt.figure(figsize=(12, 6))
-        pos = graphviz_layout(graph, prog='dot')
+        figure = new_figure(show)
+        ax = figure.add_subplot()
+        pos = compute_layout(graph, layout_cache)
+        # Large graphs are drawn with plain lines and without edge labels
+        arrows = detailed(graph)
 
         # Draw edge labels within the edge names
         edge_labels = nx.get_edge_attributes(graph, 'label')
-        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_size=8)
+        if arrows:
+            nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_size=8, ax=ax)
 
         # Draw non-critical, non-dummy edges
         non_critical_non_dummy_edges = [(u, v) for u, v, d in graph.edges(data=True) if not d['is_critical'] and not d['is_dummy']]
-        nx.draw_networkx_edges(graph, pos, edgelist=non_critical_non_dummy_edges, edge_color='black', arrows=True)
+        nx.draw_networkx_edges(graph, pos, edgelist=non_critical_non_dummy_edges, edge_color='black', arrows=arrows, ax=ax)
 
         # Draw non-critical dummy edges
         non_critical_dummy_edges = [(u, v) for u, v, d in graph.edges(data=True) if not d['is_critical'] and d['is_dummy']]
-        nx.draw_networkx_edges(graph, pos, edgelist=non_critical_dummy_edges, edge_color='lightgray', arrows=True)
+        nx.draw_networkx_edges(graph, pos, edgelist=non_critical_dummy_edges, edge_color='lightgray', arrows=arrows, ax=ax)
 
         # Draw critical edges
         critical_edges = [(u, v) for u, v, d in graph.edges(data=True) if d['is_critical']]
-        nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=True)
+        nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=arrows, ax=ax)
 
         # Draw non-critical nodes
-        non_critical_nodes = [node for node in graph.nodes() if not node.is_critical]
-        nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500)
+        polar_nodes = [0, event_count-1]
+        non_critical_nodes = [node for node in graph.nodes() if node not in critical_events]
+        nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500, ax=ax)
 
         # Draw critical nodes
-        critical_path_nodes = [node for node in graph.nodes() if node.is_critical and not (len(node.incoming) == 0 or len(node.outgoing) == 0)]
-        nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500)
+        critical_path_nodes = [node for node in graph.nodes() if node in critical_events and node not in polar_nodes]
+        nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500, ax=ax)
 
         # Draw starting, ending nodes
-        polar_nodes = [node for node in graph.nodes() if (len(node.incoming) == 0 or len(node.outgoing) == 0)]
-        nx.draw_networkx_nodes(graph, pos, nodelist=polar_nodes, node_color='darkblue', node_size=500)
+        nx.draw_networkx_nodes(graph, pos, nodelist=polar_nodes, node_color='darkblue', node_size=500, ax=ax)
 
         # Draw node labels (earliest time and latest time)
         node_labels = nx.get_node_attributes(graph, 'label')
-        nx.draw_networkx_labels(graph, pos, labels=node_labels, font_size=6, font_color='white')
+        nx.draw_networkx_labels(graph, pos, labels=node_labels, font_size=6, font_color='white', ax=ax)
 
-        plt.title('Critical Path Method')
-        if not os.path.exists(outputpath):
-            os.makedirs(outputpath)
+        ax.set_title('Critical Path Method')
         makespan_line = mlines.Line2D([], [], color='none', label=f'Makespan = {makespan}')
         c_line = mlines.Line2D([], [], color='red', marker='_', markersize=15, label='Critical Paths')
         j_line = mlines.Line2D([], [], color='black', marker='_', markersize=15, label='Jn: Job n')
         d_line = mlines.Line2D([], [], color='lightgray', marker='_', markersize=15, label='D: Dummy Job')
 
         # Add the legend to the plot
-        plt.legend(handles=[makespan_line, c_line, j_line, d_line], loc='lower left', frameon=False)
+        ax.legend(handles=[makespan_line, c_line, j_line, d_line], loc='lower left', frameon=False)
     
     elif mode == 'jon' or mode == 'job_on_node':
         # Create a directed graph
@@ -271,41 +261,43 @@ def visualize_CPM(jobs: dict, CPM_results: tuple, network: Network, outputpath:
 
         # Add edges
         for job in jobs.values():
-            if job in network.sources:
+            if network.is_source(job):
                 graph.add_edge('source', job, is_critical=(job in critical_path))
-            if job in network.sinks:
+            if network.is_sink(job):
                 graph.add_edge(job, 'sink', is_critical=(job in critical_path))
             for predecessor in job.predecessors:
                 graph.add_edge(jobs[predecessor], job, is_critical=(job in critical_path and jobs[predecessor] in critical_path))
 
         # Draw the graph
-        plt.figure(figsize=(12, 6))
-        pos = graphviz_layout(graph, prog='dot')
+        figure = new_figure(show)
+        ax = figure.add_subplot()
+        pos = compute_layout(graph, layout_cache)
+        # Large graphs are drawn with plain lines and without edge labels
+        arrows = detailed(graph)
 
         # Draw Edges
         edges = [(u, v) for u, v, d in graph.edges(data=True) if not d['is_critical']]
-        nx.draw_networkx_edges(graph, pos, edgelist=edges, edge_color='black', arrows=True)
+        nx.draw_networkx_edges(graph, pos, edgelist=edges, edge_color='black', arrows=arrows, ax=ax)
 
         # Draw Critical Edges
         critical_edges = [(u, v) for u, v, d in graph.edges(data=True) if d['is_critical']]
-        nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=True)
+        nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=arrows, ax=ax)
 
         # Draw Critical Nodes
         critical_path_nodes = [node for node in graph.nodes() if node in critical_path]
-        nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500)
+        nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500, ax=ax)
 
         # Draw Non-Critical Nodes
         non_critical_nodes = [node for node in graph.nodes() if node not in critical_path]
-        nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500)
+        nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500, ax=ax)
 
         # Draw Source and Sink
-        nx.draw_networkx_nodes(graph, pos, nodelist=['source', 'sink'], node_color='darkblue', node_size=500)
+        nx.draw_networkx_nodes(graph, pos, nodelist=['source', 'sink'], node_color='darkblue', node_size=500, ax=ax)
 
         node_labels = nx.get_node_attributes(graph, 'label')
-        nx.draw_networkx_labels(graph, pos, labels=node_labels, font_size=6, font_color='white')
-        plt.title('Critical Path Method')
-    plt.savefig(outputpath+'/CPM.png')
-    plt.show()
+        nx.draw_networkx_labels(graph, pos, labels=node_labels, font_size=6, font_color='white', ax=ax)
+        ax.set_title('Critical Path Method')
+    return save_figure(figure, outputpath+'/CPM', format, show)
 
 
 def print_critical_paths(network: Network, title: str="") -> None:
@@ -1,24 +1,44 @@
 from collections import defaultdict
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'CPM'))
+from topology import topological_sort, id_key
 import numpy as np
 
+# Networks with tied durations can have exponentially many critical paths; in lazy
+# mode CPM() collects at most this many of them
+MAX_CRITICAL_PATHS = 1000
+
 class Job:
+    __slots__ = ('id', 'duration', 'predecessors', 'is_dummy', 'prev_state')
+
     def __init__(self, id, duration, predecessors, is_dummy=False, prev_state=None) -> None:
-        self.id = id
-        self.duration = duration
-        self.predecessors = [str(predecessor) for predecessor in predecessors]
-        self.is_dummy = is_dummy
-        if self.is_dummy:
-            self.prev_state = prev_state
+        # Jobs are immutable records, so fields are set once through object.__setattr__
+        set_field = object.__setattr__
+        set_field(self, 'id', id)
+        set_field(self, 'duration', duration)
+        set_field(self, 'predecessors', tuple(str(predecessor) for predecessor in predecessors))
+        set_field(self, 'is_dummy', is_dummy)
+        set_field(self, 'prev_state', prev_state if is_dummy else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'Job is immutable, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'Job is immutable, cannot delete {name}')
+
+    def __reduce__(self):
+        return (_restore_job, (self.__class__, self.id, self.duration, self.predecessors, self.is_dummy, self.prev_state))
 
     def __repr__(self) -> str:
         return self.id
     
     def __eq__(self, other):
+        # A job is identified by its id; dummies reuse the id of the state they point to
+        if self is other:
+            return True
         if isinstance(other, Job):
-            return (self.id == other.id
-                    and self.duration == other.duration
-                    and self.predecessors == other.predecessors
-                    and self.is_dummy == other.is_dummy)
+            return self.id == other.id and self.is_dummy == other.is_dummy
         return False
 
     def __ne__(self, other):
@@ -44,11 +64,22 @@ class Job:
         return hash(self.id)
 
 
+def _restore_job(cls, id, duration, predecessors, is_dummy, prev_state):
+    job = object.__new__(cls)
+    for name, value in zip(Job.__slots__, (id, duration, predecessors, is_dummy, prev_state)):
+        object.__setattr__(job, name, value)
+    return job
+
+
 class Network:
-    def __init__(self, jobs) -> None:
+    def __init__(self, jobs, lazy_paths=False, max_critical_paths=MAX_CRITICAL_PATHS) -> None:
         '''
         parameters:
         jobs: dictionary of jobs.
+        lazy_paths: if True, do not enumerate all paths up front; CPM() keeps only
+            the zero-slack subgraph and critical paths are generated from it.
+        max_critical_paths: cap on the critical paths CPM() collects in lazy mode,
+            None for all of them.
         '''
         self.jobs = list(jobs.values())
         self.predecessors = defaultdict(list)
@@ -60,13 +91,54 @@ class Network:
         self.sources = []
         self.sinks = []
         self.sort()
-        self.paths = self.all_paths()
+        self.paths = None if lazy_paths else self.all_paths()
+        self.max_critical_paths = max_critical_paths
+        self.critical_successors = None
+        self.critical_sources = []
         self.critical_paths = []
 
+    def build_critical_subgraph(self, earliest_start_time, earliest_finish_time, slacks) -> None:
+        '''
+        keep only the edges between zero-slack jobs where the successor starts
+        as soon as the predecessor finishes; every source-to-sink path of this
+        subgraph is a critical path.
+        '''
+        self.critical_successors = defaultdict(list)
+        for job in self.jobs:
+            if not np.round(slacks[job], 1) == 0.0:
+                continue
+            for successor in self.successors[job.id]:
+                if np.round(slacks[successor], 1) == 0.0 and np.round(earliest_start_time[successor.id] - earliest_finish_time[job.id], 1) == 0.0:
+                    self.critical_successors[job.id].append(successor)
+        self.critical_sources = [job for job in self.sources if np.round(slacks[job], 1) == 0.0]
+
+    def iter_critical_paths(self, limit=None):
+        '''
+        lazily yield the critical paths of the zero-slack subgraph, at most limit of them
+        '''
+        count = 0
+        for source in self.critical_sources:
+            path = [source]
+            stack = [iter(self.critical_successors[source.id])]
+            while stack:
+                if len(self.critical_successors[path[-1].id]) == 0:
+                    # Reached a sink of the critical subgraph
+                    yield list(path)
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+                successor = next(stack[-1], None)
+                if successor is None:
+                    stack.pop()
+                    path.pop()
+                else:
+                    path.append(successor)
+                    stack.append(iter(self.critical_successors[successor.id]))
+
     def all_paths(self) -> list:
         def dfs(current, path):
             # If the current job is a sink, add the path to the result
-            if current in self.sinks:
+            if self.is_sink(current):
                 paths.append(path)
                 return
             
@@ -83,6 +155,14 @@ class Network:
 
     def sort(self) -> None:
         self.sources, self.sinks, self.jobs = topological_sort(self.jobs, self.successors)
+        self.source_ids = set(job.id for job in self.sources)
+        self.sink_ids = set(job.id for job in self.sinks)
+
+    def is_source(self, job) -> bool:
+        return job.id in self.source_ids
+
+    def is_sink(self, job) -> bool:
+        return job.id in self.sink_ids
 
     def get_jobs(self) -> list:
         return self.jobs
@@ -93,36 +173,6 @@ class Network:
     def get_successors(self) -> defaultdict:
         return self.successors
 
-def topological_sort(jobs, successors) -> tuple:
-    in_degree = defaultdict(int)
-    sorted_order = []
-
-    # Calculate in-degree for each job
-    for job in jobs:
-        for successor in successors[job.id]:
-            in_degree[successor.id] += 1
-
-    # Find jobs with no incoming edges (in-degree = 0)
-    sources = [job for job in jobs if job.id not in in_degree or in_degree[job.id] == 0]
-    sources_to_return = [job for job in jobs if job.id not in in_degree or in_degree[job.id] == 0]
-    sinks = []
-
-    # Perform topological sort
-    while sources:
-        job = sources.pop(0)
-        sorted_order.append(job)
-
-        # Decrement the in-degree of each successor and add to sources if in-degree becomes 0
-        for successor in successors[job.id]:
-            in_degree[successor.id] -= 1
-            if in_degree[successor.id] == 0:
-                sources.append(successor)
-
-        # Check if the job is a sink (no outgoing edges)
-        if job.id not in successors or len(successors[job.id]) == 0:
-            sinks.append(job)
-
-    return sources_to_return, sinks, sorted_order
 
 def calculate_earliest_times(network) -> tuple:
     jobs = network.get_jobs()
@@ -136,7 +186,7 @@ def calculate_earliest_times(network) -> tuple:
         earliest_start_time[job.id] = 0  # Initialize earliest start time to 0
 
     for job in jobs:
-        if job in network.sources:
+        if network.is_source(job):
             # Job has no dependencies, set earliest finish time to its duration
             earliest_finish_time[job.id] = job.duration
         else:
@@ -161,10 +211,9 @@ def calculate_latest_times(network, earliest_finish_time) -> tuple:
         latest_finish_time[job.id] = project_duration  # Initialize latest finish time to project duration
         latest_start_time[job.id] = project_duration - job.duration
 
-    jobs.reverse()
-    for job in jobs:
+    for job in reversed(jobs):
         # Calculate latest start time as the minimum of latest start times of dependent jobs
-        if job in network.sinks:
+        if network.is_sink(job):
             continue
         else:
             latest_finish_time[job.id] = min(latest_start_time[successor.id] for successor in successors[job.id])
@@ -183,7 +232,7 @@ def calculate_slacks(jobs, earliest_start_time, latest_start_time) -> dict:
 
 def calculate_critical_path(slacks) -> list:
     critical_path = [job for job, slack_time in slacks.items() if np.round(slack_time, 1) == 0.0]
-    return sorted(critical_path, key=(lambda x : int(x.id)))
+    return sorted(critical_path, key=(lambda x : id_key(x.id)))
 
 
 def CPM(network) -> tuple:
@@ -192,6 +241,10 @@ def CPM(network) -> tuple:
     slacks = calculate_slacks(network.jobs, earliest_start_time, latest_start_time)
     critical_path = calculate_critical_path(slacks)
     makespan = max(earliest_finish_time.values())
+    if network.paths is None:
+        network.build_critical_subgraph(earliest_start_time, earliest_finish_time, slacks)
+        network.critical_paths = list(network.iter_critical_paths(network.max_critical_paths))
+        return earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, critical_path, makespan
     for path in network.paths:
         tmp_span = 0
         for job in path:
@@ -0,0 +1,178 @@
+import numpy as np
+from scipy.signal import fftconvolve
+from scipy.special import ndtr
+
+
+def job_moments(simulation, resolution=1024) -> tuple:
+    '''
+    mean and variance of every job's duration under the simulation's distribution,
+    from its inverse CDF at resolution equally likely quantiles (so the clipping of
+    the normal and the beta shapes are taken into account)
+    '''
+    durations = simulation.ppf(np.broadcast_to(quantile_levels(resolution)[:, None], (resolution, len(simulation))))
+    return durations.mean(axis=0), durations.var(axis=0)
+
+
+def clark_max(mean1, variance1, mean2, variance2, covariance=0.0) -> tuple:
+    '''
+    Clark's moment matching: mean and variance of max(X, Y) for jointly normal X and Y
+
+    returns: mean, variance, and the tightness probability P(X > Y)
+    '''
+    spread = np.sqrt(np.maximum(variance1 + variance2 - 2*covariance, 0.0))
+    safe = np.where(spread > 0, spread, 1.0)
+    alpha = (mean1 - mean2) / safe
+    first, second = ndtr(alpha), ndtr(-alpha)
+    density = np.exp(-alpha**2/2) / np.sqrt(2*np.pi)
+    mean = mean1*first + mean2*second + spread*density
+    moment2 = (mean1**2 + variance1)*first + (mean2**2 + variance2)*second + (mean1 + mean2)*spread*density
+    variance = np.maximum(moment2 - mean**2, 0.0)
+    # Without spread the maximum is exact
+    degenerate = spread == 0
+    first = np.where(degenerate, (mean1 >= mean2).astype(np.float64), first)
+    mean = np.where(degenerate, np.maximum(mean1, mean2), mean)
+    variance = np.where(degenerate, np.where(mean1 >= mean2, variance1, variance2), variance)
+    return mean, variance, first
+
+
+def clark_makespan(network, means, variances, max_correlated_jobs=4000) -> tuple:
+    '''
+    Normal approximation of the makespan: finish times are propagated level by level as
+    normals, sums add means and variances, and merges take Clark's max of the predecessors'
+    finish times.
+
+    Up to max_correlated_jobs jobs, every finish time is kept in canonical form, a linear
+    combination of the job durations plus an independent remainder, so merges of paths
+    sharing jobs use their covariance. A max passes on the predecessors' sensitivities
+    weighted by its tightness probabilities. This takes (jobs x jobs) memory. Larger
+    networks treat merging finish times as independent, which overestimates the makespan
+    of networks where paths split and merge again.
+
+    parameters:
+    network: CompiledNetwork.
+    means, variances: duration moments by job position.
+
+    returns: mean and standard deviation of the makespan
+    '''
+    n = len(network)
+    correlated = n <= max_correlated_jobs
+    schedule = network.forward
+    finish_mean = np.zeros(n)
+    finish_variance = np.zeros(n)
+    # Sensitivity of every finish time to each job duration's standard score
+    sensitivities = np.zeros((n, n) if correlated else (n, 0))
+    for level in range(len(schedule.level_indptr)-1):
+        start, stop = schedule.level_indptr[level], schedule.level_indptr[level+1]
+        nodes = schedule.order[start:stop]
+        first_edges = schedule.edge_indptr[start:stop]
+        counts = schedule.edge_indptr[start+1:stop+1] - first_edges
+        start_mean = np.zeros(len(nodes))
+        start_variance = np.zeros(len(nodes))
+        start_sensitivities = np.zeros((len(nodes), sensitivities.shape[1]))
+        # Fold the predecessors in one at a time, all jobs of the level together
+        for slot in range(int(counts.max(initial=0))):
+            rows = np.flatnonzero(counts > slot)
+            predecessors = schedule.edge_sources[first_edges[rows] + slot]
+            if slot == 0:
+                start_mean[rows], start_variance[rows] = finish_mean[predecessors], finish_variance[predecessors]
+                start_sensitivities[rows] = sensitivities[predecessors]
+                continue
+            covariance = np.einsum('ij,ij->i', start_sensitivities[rows], sensitivities[predecessors])
+            start_mean[rows], start_variance[rows], tightness = clark_max(start_mean[rows], start_variance[rows], finish_mean[predecessors], finish_variance[predecessors], covariance)
+            if correlated:
+                start_sensitivities[rows] = tightness[:, None]*start_sensitivities[rows] + (1 - tightness[:, None])*sensitivities[predecessors]
+        finish_mean[nodes] = start_mean + means[nodes]
+        finish_variance[nodes] = start_variance + variances[nodes]
+        if correlated:
+            start_sensitivities[np.arange(len(nodes)), nodes] += np.sqrt(variances[nodes])
+            sensitivities[nodes] = start_sensitivities
+
+    # Pairwise maximum over the sinks
+    sinks = network.sinks
+    mean, variance, sink_sensitivities = finish_mean[sinks], finish_variance[sinks], sensitivities[sinks]
+    while len(mean) > 1:
+        half = len(mean) // 2
+        covariance = np.einsum('ij,ij->i', sink_sensitivities[:half], sink_sensitivities[half:2*half])
+        merged_mean, merged_variance, tightness = clark_max(mean[:half], variance[:half], mean[half:2*half], variance[half:2*half], covariance)
+        merged_sensitivities = tightness[:, None]*sink_sensitivities[:half] + (1 - tightness[:, None])*sink_sensitivities[half:2*half]
+        mean = np.concatenate((merged_mean, mean[2*half:]))
+        variance = np.concatenate((merged_variance, variance[2*half:]))
+        sink_sensitivities = np.concatenate((merged_sensitivities, sink_sensitivities[2*half:]))
+    return float(mean[0]) if len(mean) else 0.0, float(np.sqrt(variance[0])) if len(variance) else 0.0
+
+
+def discrete_makespan(simulation, bins=2048, resolution=1024) -> tuple:
+    '''
+    Makespan distribution from durations discretized on a time grid: a job's start CDF
+    is the product of its predecessors' finish CDFs (independent merges), and its finish
+    distribution the FFT convolution of its start and duration probabilities. Levels are
+    processed together, one (jobs x bins) array per level.
+
+    parameters:
+    simulation: MonteCarlo, giving the network and the duration distributions.
+    bins: grid points between 0 and the makespan with every job at its largest duration
+        (the grid gets one more point per level, as room for rounding).
+    resolution: equally likely quantiles per job used to discretize the durations.
+
+    returns: grid of times (bins), and the makespan CDF on it
+    '''
+    network = simulation.network
+    n = len(network)
+    durations = simulation.ppf(np.broadcast_to(quantile_levels(resolution)[:, None], (resolution, n)))
+    longest = durations.max(axis=0)
+    _, upper_finish = network.forward_pass(longest)
+    step = max(float(upper_finish.max(initial=0.0)), 1e-12) / (bins - 1)
+    # Rounding a duration to the grid moves it by at most half a step, once per level
+    levels = len(network.forward.level_indptr) - 1
+    length = bins + levels
+
+    # Duration probabilities per job on the grid
+    width = int(np.ceil(longest.max(initial=0.0) / step)) + 1
+    cells = np.clip(np.rint(durations / step).astype(np.int64), 0, width-1)
+    duration_pmf = np.bincount((np.arange(n) * width + cells).ravel(), minlength=n*width).reshape(n, width) / resolution
+
+    schedule = network.forward
+    finish_cdf = np.zeros((n, length))
+    for level in range(len(schedule.level_indptr)-1):
+        start, stop = schedule.level_indptr[level], schedule.level_indptr[level+1]
+        nodes = schedule.order[start:stop]
+        if level == 0:
+            start_cdf = np.ones((len(nodes), length))
+        else:
+            edges = schedule.edge_sources[schedule.edge_indptr[start]:schedule.edge_indptr[stop]]
+            offsets = schedule.edge_indptr[start:stop] - schedule.edge_indptr[start]
+            start_cdf = np.multiply.reduceat(finish_cdf[edges], offsets, axis=0)
+        start_pmf = np.diff(start_cdf, axis=1, prepend=0.0)
+        finish_pmf = np.maximum(fftconvolve(start_pmf, duration_pmf[nodes], axes=1)[:, :length], 0.0)
+        # The grid covers every finish time, so the CDF ends at 1; normalizing keeps FFT
+        # round-off from being multiplied by the in-degree at every merge
+        cdf = np.cumsum(finish_pmf, axis=1)
+        finish_cdf[nodes] = cdf / cdf[:, -1:]
+
+    makespan_cdf = np.prod(finish_cdf[network.sinks], axis=0)
+    return np.arange(length) * step, makespan_cdf
+
+
+def makespan_distribution(simulation, method='clark', bins=2048) -> tuple:
+    '''
+    near-instant makespan CDF, standing in for the simulation in interactive use
+
+    parameters:
+    simulation: MonteCarlo.
+    method: 'clark' (normal with Clark's moments) or 'discrete' (gridded distributions).
+    bins: points of the returned grid.
+
+    returns: grid of times, makespan CDF on it
+    '''
+    if method == 'discrete':
+        return discrete_makespan(simulation, bins)
+    if method != 'clark':
+        raise ValueError(f"unknown method {method!r}, expected 'clark' or 'discrete'")
+    mean, std = clark_makespan(simulation.network, *job_moments(simulation))
+    x = np.linspace(mean - 5*std, mean + 5*std, bins)
+    return x, ndtr((x - mean) / std) if std > 0 else (x >= mean).astype(np.float64)
+
+
+def quantile_levels(resolution) -> np.ndarray:
+    # Midpoints of resolution equally likely intervals of (0, 1)
+    return (np.arange(resolution) + 0.5) / resolution
@@ -0,0 +1,132 @@
+import io, json, os, time
+import numpy as np
+from streaming import SimulationStatistics
+
+# Bumped whenever the layout of the checkpoint arrays changes
+CHECKPOINT_VERSION = 1
+
+
+class Checkpoint(object):
+    def __init__(self, path, fingerprint, entropy, batch_size, next_block=0, interval=60.0) -> None:
+        '''
+        Progress of a simulation saved to disk: its statistics and where its random
+        streams stand. Block b always draws from SeedSequence(entropy, spawn_key=(b,)),
+        so the seed entropy and the next block index are the whole RNG state, and a
+        resumed run draws exactly the samples an uninterrupted one would have.
+
+        parameters:
+        path: checkpoint file, a compressed numpy archive.
+        fingerprint: MonteCarlo.fingerprint() of the simulation, checked on resume.
+        entropy: entropy of the run's SeedSequence.
+        batch_size: iterations per block.
+        next_block: index of the first block not merged into the statistics yet.
+        interval: seconds between saves while the run goes on.
+        '''
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entropy = entropy
+        self.batch_size = batch_size
+        self.next_block = next_block
+        self.interval = interval
+        self.saved = time.monotonic()
+        # Set once a partial block has been merged after the last save
+        self.partial = False
+
+    def merge(self, statistics, block_statistics) -> None:
+        '''
+        merge the next block into statistics, and save once interval seconds have passed
+        since the last save. A partial block can only end a run; it is merged after
+        saving the statistics without it, so that a run extended from the checkpoint
+        draws the whole block, as an uninterrupted run does.
+        '''
+        if block_statistics.count < self.batch_size:
+            self.save(statistics)
+            statistics.merge(block_statistics)
+            self.partial = True
+            return
+        statistics.merge(block_statistics)
+        self.next_block += 1
+        if time.monotonic() - self.saved >= self.interval:
+            self.save(statistics)
+
+    def save(self, statistics) -> None:
+        '''
+        write the checkpoint to a temporary file and move it over the previous one, so
+        that a crash while saving leaves the last complete checkpoint
+        '''
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, version=np.int64(CHECKPOINT_VERSION), fingerprint=np.array(self.fingerprint),
+                            entropy=np.array(json.dumps(self.entropy)), batch_size=np.int64(self.batch_size),
+                            next_block=np.int64(self.next_block), **statistics_arrays(statistics))
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(buffer.getbuffer())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.path)
+        self.saved = time.monotonic()
+
+    @classmethod
+    def load(cls, path, interval=60.0) -> tuple:
+        '''
+        returns: the Checkpoint and the SimulationStatistics saved in path
+        '''
+        with np.load(path, allow_pickle=False) as archive:
+            arrays = dict(archive)
+        if int(arrays['version']) != CHECKPOINT_VERSION:
+            raise ValueError(f'{path} is a version {int(arrays["version"])} checkpoint, expected version {CHECKPOINT_VERSION}')
+        checkpoint = cls(path, str(arrays['fingerprint']), json.loads(str(arrays['entropy'])),
+                         int(arrays['batch_size']), int(arrays['next_block']), interval)
+        return checkpoint, statistics_from_arrays(arrays)
+
+
+def statistics_arrays(statistics) -> dict:
+    '''
+    SimulationStatistics as a dictionary of numpy arrays, for np.savez
+    '''
+    moments, sketch, cross = statistics.moments, statistics.sketch, statistics.cross
+    paths = statistics.paths.most_common()
+    return {
+        'n': np.int64(len(statistics.critical_counts)),
+        'thresholds': statistics.thresholds,
+        'exceedances': statistics.exceedances,
+        'critical_counts': statistics.critical_counts,
+        'moments_count': np.int64(moments.count),
+        'moments': np.array([moments.mean, moments.m2, moments.minimum, moments.maximum]),
+        'sketch_k': np.int64(sketch.k),
+        'sketch_count': np.int64(sketch.count),
+        'sketch_values': np.concatenate(sketch.levels),
+        'sketch_lengths': np.array([len(values) for values in sketch.levels], dtype=np.int64),
+        'sketch_compactions': np.array(sketch.compactions, dtype=np.int64),
+        'cross_count': np.int64(cross.count),
+        'cross_makespan': np.array([cross.makespan_mean, cross.makespan_m2]),
+        'cross_durations': np.stack((cross.duration_mean, cross.duration_m2, cross.comoment)),
+        'max_paths': np.int64(statistics.paths.max_paths),
+        'path_keys': np.array([key for key, _, _, _ in paths], dtype=np.uint64),
+        'path_counts': np.array([count for _, count, _, _ in paths], dtype=np.int64),
+        'path_totals': np.array([total for _, _, total, _ in paths], dtype=np.float64),
+        'path_masks': np.array([np.frombuffer(mask, dtype=np.uint8) for _, _, _, mask in paths], dtype=np.uint8).reshape(len(paths), (len(statistics.critical_counts) + 7) // 8),
+    }
+
+
+def statistics_from_arrays(arrays) -> SimulationStatistics:
+    '''
+    rebuild the SimulationStatistics of statistics_arrays
+    '''
+    statistics = SimulationStatistics(int(arrays['n']), arrays['thresholds'], int(arrays['sketch_k']), int(arrays['max_paths']))
+    statistics.exceedances = arrays['exceedances'].astype(np.int64)
+    statistics.critical_counts = arrays['critical_counts'].astype(np.int64)
+    moments = statistics.moments
+    moments.count = int(arrays['moments_count'])
+    moments.mean, moments.m2, moments.minimum, moments.maximum = arrays['moments'].tolist()
+    sketch = statistics.sketch
+    sketch.count = int(arrays['sketch_count'])
+    sketch.levels = np.split(arrays['sketch_values'], np.cumsum(arrays['sketch_lengths'])[:-1])
+    sketch.compactions = arrays['sketch_compactions'].tolist()
+    cross = statistics.cross
+    cross.count = int(arrays['cross_count'])
+    cross.makespan_mean, cross.makespan_m2 = arrays['cross_makespan'].tolist()
+    cross.duration_mean, cross.duration_m2, cross.comoment = (row.copy() for row in arrays['cross_durations'])
+    statistics.paths.paths = {key: (count, total, mask.tobytes()) for key, count, total, mask in
+                              zip(arrays['path_keys'].tolist(), arrays['path_counts'].tolist(), arrays['path_totals'].tolist(), arrays['path_masks'])}
+    return statistics
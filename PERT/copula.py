@@ -0,0 +1,151 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.special import gammaincinv, ndtr, ndtri, stdtr
+
+# Uniforms handed to the inverse CDFs stay inside (0, 1), so that unbounded
+# distributions such as the lognormal never see an infinite standard score
+SMALLEST_UNIFORM = np.finfo(np.float64).tiny
+LARGEST_UNIFORM = np.nextafter(1.0, 0.0)
+
+
+class Copula(object):
+    def __init__(self, n, loadings=None, correlation=None, df=None) -> None:
+        '''
+        Gaussian or t copula of the job durations: job j gets the standard score
+        z_j = sum_k loadings[j, k] f_k + sqrt(1 - sum_k loadings[j, k]^2) e_j
+        from k shared factors f (crews, weather) and residuals e with correlation matrix
+        correlation, and its uniform is the normal (or t) CDF of z_j. The durations keep
+        their distributions and inherit the correlation of the scores.
+
+        The factors are a low-rank term, so any number of jobs costs (jobs x factors).
+        The residual correlation is factorized block by block: jobs are split into the
+        connected components of its non-zero entries and each component gets its own
+        Cholesky factor, so a sparse matrix of small clusters stays cheap.
+
+        parameters:
+        n: number of jobs.
+        loadings: (jobs x factors) array or sparse matrix, rows of squared norm at most 1.
+        correlation: (jobs x jobs) residual correlation, dense or sparse; its diagonal is
+            taken as 1. Blocks that are not positive definite are repaired by clipping
+            their eigenvalues.
+        df: degrees of freedom of a t copula, whose common scale makes extreme durations
+            coincide more often; None for the Gaussian copula.
+        '''
+        self.n = n
+        self.loadings = sparse.csr_matrix(loadings if loadings is not None else (n, 0), dtype=np.float64)
+        if self.loadings.shape[0] != n:
+            raise ValueError(f'expected loadings for {n} jobs, got {self.loadings.shape[0]}')
+        common = np.asarray(self.loadings.multiply(self.loadings).sum(axis=1)).ravel()
+        if np.any(common > 1 + 1e-12):
+            raise ValueError('every row of loadings must have a squared norm of at most 1')
+        self.residual_scale = np.sqrt(np.maximum(1 - common, 0.0))
+        self.blocks = [] if correlation is None else block_cholesky(correlation)
+        if df is not None and df <= 0:
+            raise ValueError(f'df must be positive, got {df}')
+        self.df = df
+        self.t_cdf = None if df is None else StudentCDF(df)
+
+    @classmethod
+    def from_groups(cls, groups, correlation, df=None) -> 'Copula':
+        '''
+        one shared factor per group: jobs of a group are correlated by its correlation,
+        jobs of different groups or without a group are independent
+
+        parameters:
+        groups: group label of every job, None or '' for no group.
+        correlation: correlation within every group, or a dictionary of them by label.
+        '''
+        # Blank cells of a CSV column come as NaN
+        labels = [None if group is None or group != group or group == '' else group for group in groups]
+        names = list(dict.fromkeys(label for label in labels if label is not None))
+        columns = {name: column for column, name in enumerate(names)}
+        rows = [row for row, label in enumerate(labels) if label is not None]
+        values = [correlation[labels[row]] if isinstance(correlation, dict) else correlation for row in rows]
+        if any(value < 0 or value > 1 for value in values):
+            raise ValueError('correlations within groups must be between 0 and 1')
+        loadings = sparse.csr_matrix((np.sqrt(values), (rows, [columns[labels[row]] for row in rows])), shape=(len(labels), len(names)))
+        return cls(len(labels), loadings, df=df)
+
+    @property
+    def dimension(self) -> int:
+        '''
+        uniforms consumed per iteration: one per job, one per factor, and one for the
+        scale of a t copula
+        '''
+        return self.n + self.loadings.shape[1] + (self.df is not None)
+
+    def __call__(self, u) -> np.ndarray:
+        '''
+        map (rows x dimension) independent uniforms, of any sampling design, to
+        (rows x jobs) correlated uniforms
+        '''
+        u = np.clip(u, SMALLEST_UNIFORM, LARGEST_UNIFORM)
+        scores = ndtri(u[:, :self.n])
+        for indices, factors in self.blocks:
+            # Blocks of one size together: (blocks x rows x size) @ (blocks x size x size)
+            scores[:, indices] = np.matmul(scores[:, indices].transpose(1, 0, 2), factors.transpose(0, 2, 1)).transpose(1, 0, 2)
+        scores *= self.residual_scale
+        k = self.loadings.shape[1]
+        if k:
+            scores += (self.loadings @ ndtri(u[:, self.n:self.n+k]).T).T
+        if self.df is None:
+            return np.clip(ndtr(scores), SMALLEST_UNIFORM, LARGEST_UNIFORM)
+        # Chi-square of df degrees of freedom, divided by df, shared by the row
+        scale = 2 * gammaincinv(self.df/2, u[:, -1]) / self.df
+        return np.clip(self.t_cdf(scores / np.sqrt(scale)[:, None]), SMALLEST_UNIFORM, LARGEST_UNIFORM)
+
+
+class StudentCDF(object):
+    def __init__(self, df, resolution=4096) -> None:
+        '''
+        CDF of Student's t with df degrees of freedom, tabulated on resolution cells
+        equally spaced in arctan(x) and interpolated linearly; the angle maps the whole
+        line onto a bounded interval on which the CDF is smooth. Within 1e-6 of stdtr,
+        at a fraction of its cost.
+        '''
+        self.resolution = resolution
+        self.table = stdtr(df, np.tan(np.linspace(-np.pi/2, np.pi/2, resolution+1)))
+        self.table[0], self.table[-1] = 0.0, 1.0
+
+    def __call__(self, x) -> np.ndarray:
+        position = (np.arctan(x) / np.pi + 0.5) * self.resolution
+        cell = np.minimum(position.astype(np.int64), self.resolution-1)
+        low = self.table[cell]
+        return low + (position - cell) * (self.table[cell+1] - low)
+
+
+def block_cholesky(correlation) -> list:
+    '''
+    Cholesky factors of the diagonal blocks of a correlation matrix, one per connected
+    component of its non-zero entries, stacked by block size
+
+    returns: [(indices, factors)] with indices (blocks x size) and factors
+    (blocks x size x size), for every block size above 1
+    '''
+    matrix = sparse.csr_matrix(correlation, dtype=np.float64)
+    matrix.setdiag(0.0)
+    matrix.eliminate_zeros()
+    if np.any(np.abs((matrix - matrix.T).data) > 1e-12):
+        raise ValueError('correlation must be symmetric')
+    count, component = connected_components(matrix, directed=False)
+    order = np.argsort(component, kind='stable')
+    sizes = np.bincount(component, minlength=count)
+    members = np.split(order, np.cumsum(sizes)[:-1])
+    blocks = []
+    for size in np.unique(sizes[sizes > 1]).tolist():
+        indices = np.array([member for member in members if len(member) == size])
+        factors = np.array([_cholesky(matrix[member][:, member].toarray() + np.eye(size)) for member in indices])
+        blocks.append((indices, factors))
+    return blocks
+
+
+def _cholesky(block) -> np.ndarray:
+    try:
+        return np.linalg.cholesky(block)
+    except np.linalg.LinAlgError:
+        # Nearest positive definite correlation: clip the eigenvalues, restore the unit diagonal
+        values, vectors = np.linalg.eigh(block)
+        repaired = (vectors * np.maximum(values, 1e-8)) @ vectors.T
+        scale = 1 / np.sqrt(np.diag(repaired))
+        return np.linalg.cholesky(repaired * np.outer(scale, scale))
@@ -2,12 +2,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 import sys
 from os.path import dirname, realpath
-from scipy.special import betaincinv
+from scipy.special import betaincinv, ndtr, ndtri
 from CPM import Job
 
 class PJob(Job):
-    def __init__(self, id, optimistic, most_likely, pessimistic, predecessors, is_dummy=False, prev_state=None) -> None:
-        duration = self.normal_duration(optimistic, most_likely, pessimistic)
+    __slots__ = ()
+
+    def __init__(self, id, optimistic, most_likely, pessimistic, predecessors, is_dummy=False, prev_state=None, distribution=None, group=None) -> None:
+        duration = self.DURATIONS[distribution or 'normal'](optimistic, most_likely, pessimistic)
         super().__init__(id, duration, predecessors, is_dummy, prev_state)
 
     @staticmethod
@@ -20,35 +22,75 @@ class PJob(Job):
         elif duration > pessimistic:
             duration = pessimistic
         return duration
-    
+
+    @staticmethod
+    def truncated_normal_duration(optimistic, most_likely, pessimistic) -> float:
+        mean = (optimistic + 4*most_likely + pessimistic)/6
+        std_dev = np.absolute((pessimistic-optimistic)/6)
+        if std_dev == 0:
+            return mean
+        low, high = ndtr((optimistic-mean)/std_dev), ndtr((pessimistic-mean)/std_dev)
+        return mean + std_dev*ndtri(np.random.uniform(low, high))
+
     @staticmethod
     def beta_duration(optimistic, most_likely, pessimistic) -> float:
-        return optimistic + np.random.beta(np.max((most_likely-optimistic, 0.0001)), pessimistic-most_likely)*(pessimistic-optimistic)
-    
+        alpha = np.max((most_likely-optimistic, 0.0001))
+        beta_param = np.max((pessimistic-most_likely, 0.0001))
+        return optimistic + np.random.beta(alpha, beta_param)*(pessimistic-optimistic)
+
     @staticmethod
     def pert_duration(optimistic, most_likely, pessimistic) -> float:
         if pessimistic == optimistic:
             return most_likely
         alpha = 1 + 4 * (most_likely-optimistic) / (pessimistic-optimistic)
-        beta = 1 + 4 * (pessimistic-most_likely) / (pessimistic - optimistic)
-        z = betaincinv(alpha, beta, np.random.uniform(0, 1))
-        beta_param = 1 + 4 * (pessimistic - most_likely) / (pessimistic - optimistic)
-        z = beta.ppf(np.random.uniform(0, 1), alpha, beta_param)
+        beta_param = 1 + 4 * (pessimistic-most_likely) / (pessimistic-optimistic)
+        z = betaincinv(alpha, beta_param, np.random.uniform(0, 1))
         return optimistic + z * (pessimistic - optimistic)
 
+    @staticmethod
+    def triangular_duration(optimistic, most_likely, pessimistic) -> float:
+        if pessimistic == optimistic:
+            return most_likely
+        return np.random.triangular(optimistic, most_likely, pessimistic)
+
+    @staticmethod
+    def lognormal_duration(optimistic, most_likely, pessimistic) -> float:
+        mean = (optimistic + 4*most_likely + pessimistic)/6
+        sigma = np.sqrt(np.log1p(((pessimistic-optimistic)/6/mean)**2))
+        return np.random.lognormal(np.log(mean) - sigma**2/2, sigma)
+
+    # Scalar samplers by distribution name, the names of sampling.DISTRIBUTIONS
+    DURATIONS = {
+        'normal': normal_duration,
+        'truncated_normal': truncated_normal_duration,
+        'beta': beta_duration,
+        'pert': pert_duration,
+        'triangular': triangular_duration,
+        'lognormal': lognormal_duration,
+    }
+
 
 class OJob(Job):
-    def __init__(self, id, optimistic, most_likely, pessimistic, predecessors, is_dummy=False, prev_state=None) -> None:
+    __slots__ = ()
+
+    def __init__(self, id, optimistic, most_likely, pessimistic, predecessors, is_dummy=False, prev_state=None, distribution=None, group=None) -> None:
         super().__init__(id, most_likely, predecessors, is_dummy, prev_state)
 
 def arg():
     inputpath = dirname(realpath(__file__))+'/input/example.csv'
     outputpath = dirname(realpath(__file__))+'/output'
     threshold = None
+    tolerances = {}
     if len(sys.argv) > 1:
         inputpath = sys.argv[1]
     if len(sys.argv) > 2:
         outputpath = sys.argv[2]
     if len(sys.argv) > 3:
         threshold = int(sys.argv[3])
-    return inputpath, outputpath, threshold
\ No newline at end of file
+    # Optional tolerances make the simulation adaptive: the confidence interval width on
+    # the mean makespan, then on the probabilities (over threshold and mode path criticality)
+    if len(sys.argv) > 4:
+        tolerances['mean_tolerance'] = float(sys.argv[4])
+    if len(sys.argv) > 5:
+        tolerances['probability_tolerance'] = tolerances['criticality_tolerance'] = float(sys.argv[5])
+    return inputpath, outputpath, threshold, tolerances
\ No newline at end of file
@@ -5,5 +5,5 @@ from job_PERT import *
 from visualize import *
 
 if __name__ == '__main__':
-    inputpath, outputpath, threshold = arg()
-    run(inputpath, outputpath, threshold)
+    inputpath, outputpath, threshold, tolerances = arg()
+    run(inputpath, outputpath, threshold, **tolerances)
@@ -0,0 +1,197 @@
+import numpy as np
+from scipy.special import betaincinv, ndtr, ndtri
+from scipy.stats import qmc
+
+
+def random_uniforms(size, dimension, rng) -> np.ndarray:
+    return rng.random((size, dimension))
+
+
+def antithetic_uniforms(size, dimension, rng) -> np.ndarray:
+    '''
+    pairs of rows u and 1-u; monotone responses such as the makespan then vary less
+    than with independent rows
+    '''
+    half = rng.random(((size + 1) // 2, dimension))
+    return np.concatenate((half, 1.0 - half))[:size]
+
+
+def latin_hypercube_uniforms(size, dimension, rng) -> np.ndarray:
+    '''
+    every column falls exactly once into each of the size strata [i/size, (i+1)/size)
+    '''
+    strata = rng.permuted(np.broadcast_to(np.arange(size), (dimension, size)), axis=1).T
+    return (strata + rng.random((size, dimension))) / size
+
+
+def sobol_uniforms(size, dimension, rng) -> np.ndarray:
+    '''
+    scrambled Sobol points; each call is an independently scrambled sequence, so blocks
+    are independent replicates. Sobol points are balanced for powers of two, so the
+    first size points of the next power of two are used.
+    '''
+    if dimension > qmc.Sobol.MAXDIM:
+        raise ValueError(f'Sobol sampling supports at most {qmc.Sobol.MAXDIM} jobs, got {dimension}')
+    points = qmc.Sobol(dimension, scramble=True, seed=rng).random_base2(max(int(np.ceil(np.log2(max(size, 1)))), 0))
+    return points[:size]
+
+
+SAMPLING = {
+    'random': random_uniforms,
+    'antithetic': antithetic_uniforms,
+    'latin_hypercube': latin_hypercube_uniforms,
+    'sobol': sobol_uniforms,
+}
+
+
+def normal_ppf(optimistic, most_likely, pessimistic):
+    '''
+    normal with the PERT mean and standard deviation, clipped to [optimistic, pessimistic]
+    like PJob.normal_duration: the clipped tails become point masses at the bounds
+    '''
+    mean = (optimistic + 4*most_likely + pessimistic)/6
+    std_dev = np.absolute((pessimistic - optimistic)/6)
+    low, high = np.minimum(optimistic, pessimistic), np.maximum(optimistic, pessimistic)
+    return lambda u: np.clip(mean + std_dev * ndtri(u), low, high)
+
+
+def beta_ppf(optimistic, most_likely, pessimistic):
+    '''
+    optimistic + Beta(most_likely-optimistic, pessimistic-most_likely) * range, like
+    PJob.beta_duration; both shapes are kept above zero so that a mode at either bound
+    stays defined
+    '''
+    alpha = np.maximum(most_likely - optimistic, 0.0001)
+    beta = np.maximum(pessimistic - most_likely, 0.0001)
+    quantiles = BetaQuantiles(alpha, beta)
+    return lambda u: optimistic + quantiles(u) * (pessimistic - optimistic)
+
+
+def pert_ppf(optimistic, most_likely, pessimistic):
+    '''
+    PERT-beta: shapes 1 + 4(mode - min)/range and 1 + 4(max - mode)/range; jobs
+    without a range take their most likely duration
+    '''
+    spread = pessimistic - optimistic
+    degenerate = spread == 0
+    spread = np.where(degenerate, 1.0, spread)
+    quantiles = BetaQuantiles(1 + 4 * (most_likely - optimistic) / spread, 1 + 4 * (pessimistic - most_likely) / spread)
+    return lambda u: np.where(degenerate, most_likely, optimistic + quantiles(u) * spread)
+
+
+def truncated_normal_ppf(optimistic, most_likely, pessimistic):
+    '''
+    normal with the PERT mean and standard deviation, truncated to [optimistic, pessimistic]:
+    unlike normal_ppf the tails are cut off and renormalized instead of piled on the bounds
+    '''
+    mean = (optimistic + 4*most_likely + pessimistic)/6
+    std_dev = np.absolute((pessimistic - optimistic)/6)
+    safe = np.where(std_dev > 0, std_dev, 1.0)
+    low = ndtr((np.minimum(optimistic, pessimistic) - mean) / safe)
+    high = ndtr((np.maximum(optimistic, pessimistic) - mean) / safe)
+    return lambda u: np.where(std_dev > 0, mean + std_dev * ndtri(low + u * (high - low)), mean)
+
+
+def triangular_ppf(optimistic, most_likely, pessimistic):
+    '''
+    triangular distribution with its mode at most_likely
+    '''
+    spread = pessimistic - optimistic
+    degenerate = spread == 0
+    spread = np.where(degenerate, 1.0, spread)
+    mode = (most_likely - optimistic) / spread
+    def ppf(u):
+        lower = optimistic + np.sqrt(u * spread * (most_likely - optimistic))
+        upper = pessimistic - np.sqrt((1 - u) * spread * (pessimistic - most_likely))
+        return np.where(degenerate, most_likely, np.where(u < mode, lower, upper))
+    return ppf
+
+
+def lognormal_ppf(optimistic, most_likely, pessimistic):
+    '''
+    lognormal with the PERT mean and standard deviation; it is not bounded above, so
+    long overruns keep some probability
+    '''
+    mean = (optimistic + 4*most_likely + pessimistic)/6
+    std_dev = np.absolute((pessimistic - optimistic)/6)
+    sigma = np.sqrt(np.log1p((std_dev / mean)**2))
+    mu = np.log(mean) - sigma**2/2
+    return lambda u: np.exp(mu + sigma * ndtri(u))
+
+
+# Inverse CDFs by name: each takes the three-point estimates by job and returns a function
+# mapping (rows x jobs) uniforms to durations
+DISTRIBUTIONS = {
+    'normal': normal_ppf,
+    'truncated_normal': truncated_normal_ppf,
+    'beta': beta_ppf,
+    'pert': pert_ppf,
+    'triangular': triangular_ppf,
+    'lognormal': lognormal_ppf,
+}
+
+
+def distribution_ppf(distribution, optimistic, most_likely, pessimistic):
+    '''
+    inverse CDF of the durations of all jobs
+
+    parameters:
+    distribution: one name of DISTRIBUTIONS for every job, or one name per job; jobs
+        sharing a distribution are then sampled together.
+    '''
+    if isinstance(distribution, str):
+        return _checked(distribution)(optimistic, most_likely, pessimistic)
+    names = np.asarray(distribution, dtype=object)
+    if len(names) != len(optimistic):
+        raise ValueError(f'expected {len(optimistic)} distributions, got {len(names)}')
+    groups = []
+    for name in dict.fromkeys(names.tolist()):
+        columns = np.flatnonzero(names == name)
+        groups.append((columns, _checked(name)(optimistic[columns], most_likely[columns], pessimistic[columns])))
+    def ppf(u):
+        durations = np.empty(np.shape(u))
+        for columns, group_ppf in groups:
+            durations[..., columns] = group_ppf(u[..., columns])
+        return durations
+    return ppf
+
+
+def _checked(name):
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f'unknown distribution {name!r}, expected one of {list(DISTRIBUTIONS)}')
+    return DISTRIBUTIONS[name]
+
+
+class BetaQuantiles(object):
+    def __init__(self, alpha, beta, resolution=4096) -> None:
+        '''
+        Inverse CDF of Beta(alpha, beta) per job, tabulated on a grid of resolution cells
+        and interpolated linearly; betaincinv is evaluated once per distinct shape
+        instead of once per sample. Interpolation keeps every sample inside the grid cell
+        of its uniform, so each job's distribution is off by at most 1/resolution in
+        probability.
+        '''
+        self.resolution = resolution
+        shapes, self.rows = np.unique(np.stack((np.broadcast_to(alpha, np.shape(beta)), beta), axis=-1).reshape(-1, 2), axis=0, return_inverse=True)
+        self.rows = self.rows.reshape(-1)
+        self.table = betaincinv(shapes[:, :1], shapes[:, 1:], np.linspace(0.0, 1.0, resolution+1))
+
+    def __call__(self, u) -> np.ndarray:
+        position = np.asarray(u) * self.resolution
+        cell = np.minimum(position.astype(np.int64), self.resolution-1)
+        low = self.table[self.rows, cell]
+        high = self.table[self.rows, cell+1]
+        return low + (position - cell) * (high - low)
+
+
+def sample_durations(size, optimistic, most_likely, pessimistic, rng, distribution='normal', sampling='random') -> np.ndarray:
+    '''
+    (size x jobs) durations drawn by inverse CDF from uniforms of the chosen sampling design
+
+    parameters:
+    optimistic, most_likely, pessimistic: three-point estimates by job.
+    distribution: name of DISTRIBUTIONS, for all jobs or one per job.
+    sampling: 'random', 'antithetic', 'latin_hypercube' or 'sobol'.
+    '''
+    ppf = distribution_ppf(distribution, optimistic, most_likely, pessimistic)
+    return ppf(SAMPLING[sampling](size, len(optimistic), rng))
@@ -0,0 +1,304 @@
+import os, sys, hashlib
+from collections import deque
+from itertools import islice
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+# The compiled network lives in ../CPM, like the Network of CPM.py
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'CPM'))
+from compiled import CompiledNetwork, JobTable, LevelSchedule
+from sampling import SAMPLING, distribution_ppf
+from streaming import SimulationStatistics
+from checkpoint import Checkpoint
+
+ESTIMATES = ('optimistic', 'most_likely', 'pessimistic')
+
+
+class MonteCarlo(object):
+    def __init__(self, network, optimistic, most_likely, pessimistic, tolerance=1e-9, distribution='normal', sampling='random', copula=None) -> None:
+        '''
+        Monte Carlo PERT on a compiled network: durations are drawn for a whole batch
+        of iterations at once as an (iterations x jobs) matrix, and the longest-path
+        recursion runs over all rows of the batch together.
+
+        parameters:
+        network: CompiledNetwork, its durations are not used.
+        optimistic, most_likely, pessimistic: three-point estimates by job position.
+        tolerance: slack at or below which a job counts as critical in an iteration.
+        distribution: duration distribution, a name of sampling.DISTRIBUTIONS such as
+            'normal' (clipped to [optimistic, pessimistic]), 'truncated_normal', 'beta',
+            'pert', 'triangular' or 'lognormal'; or one name per job.
+        sampling: design of the uniforms fed to the inverse CDF, 'random', 'antithetic',
+            'latin_hypercube' or 'sobol'; see sampling.SAMPLING. Each block of a simulation
+            is one design, so the variance reduction works within blocks.
+        copula: copula.Copula correlating the durations, None for independent jobs. The
+            design then draws the copula's independent uniforms, which it maps to the
+            jobs' correlated uniforms.
+        '''
+        self.network = network
+        self.optimistic = np.asarray(optimistic, dtype=np.float64)
+        self.most_likely = np.asarray(most_likely, dtype=np.float64)
+        self.pessimistic = np.asarray(pessimistic, dtype=np.float64)
+        self.tolerance = tolerance
+        self.distribution = distribution
+        self.sampling = sampling
+        self.copula = copula
+        if copula is not None and copula.n != len(network):
+            raise ValueError(f'expected a copula of {len(network)} jobs, got {copula.n}')
+        if sampling not in SAMPLING:
+            raise ValueError(f'unknown sampling {sampling!r}, expected one of {list(SAMPLING)}')
+        self.ppf = distribution_ppf(distribution, self.optimistic, self.most_likely, self.pessimistic)
+
+    @classmethod
+    def from_rows(cls, rows, **options) -> 'MonteCarlo':
+        '''
+        parameters:
+        rows: iterable of dictionaries with id, optimistic, most_likely, pessimistic
+            and predecessors, e.g. the values of the jobs dictionary built by run(); a
+            distribution entry overrides the distribution option for its row.
+        options: tolerance, distribution, sampling and copula, as for MonteCarlo.
+        '''
+        rows = list(rows)
+        table = JobTable.from_rows(rows, ESTIMATES)
+        sources = [table.index[str(predecessor)] for row in rows for predecessor in row['predecessors']]
+        targets = [i for i, row in enumerate(rows) for _ in row['predecessors']]
+        means = (table['optimistic'] + 4*table['most_likely'] + table['pessimistic'])/6
+        network = CompiledNetwork.from_edges(table.ids, means, sources, targets)
+        # Blank cells of a CSV column come as NaN
+        names = [row.get('distribution') if isinstance(row.get('distribution'), str) and row.get('distribution') else None for row in rows]
+        if any(names):
+            default = options.get('distribution', 'normal')
+            options['distribution'] = [name or default for name in names]
+        return cls(network, table['optimistic'], table['most_likely'], table['pessimistic'], **options)
+
+    def __len__(self) -> int:
+        return len(self.network)
+
+    def sample(self, size, rng) -> np.ndarray:
+        '''
+        (size x jobs) durations of the simulation's distribution and sampling design
+        '''
+        if self.copula is None:
+            return self.ppf(SAMPLING[self.sampling](size, len(self), rng))
+        return self.ppf(self.copula(SAMPLING[self.sampling](size, self.copula.dimension, rng)))
+
+    @property
+    def options(self) -> dict:
+        return {'tolerance': self.tolerance, 'distribution': self.distribution, 'sampling': self.sampling, 'copula': self.copula}
+
+    def evaluate(self, durations) -> tuple:
+        '''
+        returns: makespan of every row and the (rows x jobs) mask of critical jobs
+        '''
+        _, _, _, _, slacks, makespans = self.network.cpm(durations)
+        return makespans, slacks <= self.tolerance
+
+    def simulate(self, iterations, batch_size=1024, seed=None, processes=1, tasks_per_process=4, thresholds=(), max_paths=1000, stop=None,
+                 checkpoint=None, checkpoint_interval=60.0) -> SimulationStatistics:
+        '''
+        parameters:
+        iterations: number of samples, the most that are drawn when stop is given.
+        batch_size: iterations drawn and evaluated together. Iterations are split into
+            blocks of this size and block b draws from its own generator, spawned from
+            the seed as SeedSequence(seed, spawn_key=(b,)), so for a given seed and
+            batch_size the results do not depend on the number of processes.
+        seed: integer seed or SeedSequence; None draws fresh entropy.
+        processes: number of worker processes, os.cpu_count() when None; 1 runs in this
+            process. Workers read the network from shared memory.
+        tasks_per_process: number of block ranges handed to each worker, for load balancing.
+        thresholds: makespans whose exceedance probability is counted exactly.
+        max_paths: critical paths whose counts are kept.
+        stop: callable checked on the statistics after every block, e.g. a
+            streaming.Convergence; the run ends at the first block where it returns True.
+            Blocks that workers finished beyond it are discarded, so the stopping point
+            does not depend on the number of processes either.
+        checkpoint: file in which the statistics and the next block are saved every
+            checkpoint_interval seconds and at the end (see checkpoint.Checkpoint). If it
+            exists, the run resumes from it with its seed and batch_size: blocks already
+            merged are not drawn again, and iterations may exceed those of the first run
+            to extend it. A resumed or extended run gives the results of an uninterrupted
+            one: a partial last block is left out of the checkpoint and drawn again in
+            full by an extension.
+        checkpoint_interval: seconds between checkpoints.
+
+        returns: SimulationStatistics of the makespans, job criticality and cruciality and
+        critical paths;
+        no makespan is stored, so memory does not grow with the iterations.
+        statistics.count is the number of iterations used.
+        '''
+        progress = None
+        if checkpoint is not None and os.path.exists(checkpoint):
+            progress, statistics = Checkpoint.load(checkpoint, checkpoint_interval)
+            if progress.fingerprint != self.fingerprint():
+                raise ValueError(f'{checkpoint} was saved by a simulation of another network, distribution or sampling')
+            if not np.array_equal(statistics.thresholds, np.asarray(thresholds, dtype=np.float64)) or statistics.paths.max_paths != max_paths:
+                raise ValueError(f'{checkpoint} was saved with other thresholds or max_paths')
+            if seed is not None and (seed.entropy if isinstance(seed, np.random.SeedSequence) else seed) != progress.entropy:
+                raise ValueError(f'{checkpoint} was saved with another seed')
+            seed, batch_size = np.random.SeedSequence(progress.entropy), progress.batch_size
+            if stop is not None and statistics.count and stop(statistics):
+                return statistics
+        else:
+            if not isinstance(seed, np.random.SeedSequence):
+                seed = np.random.SeedSequence(seed)
+            statistics = SimulationStatistics(len(self), thresholds, max_paths=max_paths)
+            if checkpoint is not None:
+                progress = Checkpoint(checkpoint, self.fingerprint(), seed.entropy, batch_size, interval=checkpoint_interval)
+        first_block = 0 if progress is None else progress.next_block
+        blocks = [(start, min(start+batch_size, iterations)) for start in range(statistics.count, iterations, batch_size)]
+        processes = processes or os.cpu_count() or 1
+        if stop is None:
+            task_count = max(1, min(len(blocks), processes * tasks_per_process))
+            bounds = np.linspace(0, len(blocks), task_count+1).astype(np.int64).tolist()
+        else:
+            # One block per task, so that the run can end after any block
+            bounds = list(range(len(blocks)+1))
+        tasks = [(seed.entropy, first_block + bounds[task], blocks[bounds[task]:bounds[task+1]], thresholds, max_paths) for task in range(len(bounds)-1)]
+
+        if processes == 1 or len(tasks) <= 1:
+            _merge_blocks(statistics, (simulate_blocks(self, *task) for task in tasks), stop, progress)
+        else:
+            memory, layout = share_arrays(self.__arrays())
+            try:
+                with ProcessPoolExecutor(max_workers=processes, initializer=_attach,
+                                         initargs=(memory.name, layout, len(self), self.options)) as executor:
+                    _merge_blocks(statistics, _in_order(executor, tasks, 2*processes), stop, progress)
+            finally:
+                memory.close()
+                memory.unlink()
+        if progress is not None and not progress.partial:
+            progress.save(statistics)
+        return statistics
+
+    def path_ids(self, mask) -> list:
+        '''
+        ids of the critical jobs in a packed mask of PathCounter, in topological order
+        '''
+        critical = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), count=len(self)).astype(bool)
+        order = self.network.order
+        return [self.network.ids[i] for i in order[critical[order]].tolist()]
+
+    def fingerprint(self) -> str:
+        '''
+        hash of the network, estimates and sampling options, identifying the simulation
+        a checkpoint belongs to
+        '''
+        digest = hashlib.sha256()
+        arrays = self.__arrays()
+        if self.copula is not None:
+            loadings = self.copula.loadings
+            arrays += [loadings.data, loadings.indices, loadings.indptr] + [array for block in self.copula.blocks for array in block]
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update(repr((self.tolerance, self.distribution, self.sampling, None if self.copula is None else self.copula.df)).encode())
+        return digest.hexdigest()
+
+    def __arrays(self) -> list:
+        network = self.network
+        arrays = [self.optimistic, self.most_likely, self.pessimistic, network.durations,
+                  network.pred_indptr, network.pred_indices, network.succ_indptr, network.succ_indices]
+        for schedule in (network.forward, network.backward):
+            arrays += [schedule.order, schedule.level_indptr, schedule.edge_indptr, schedule.edge_sources]
+        return arrays
+
+    @classmethod
+    def from_shared(cls, arrays, n, options) -> 'MonteCarlo':
+        '''
+        rebuild a simulation from the arrays of share_arrays, without copying them; job
+        ids are replaced by positions, which is all the sampling and passes need
+        '''
+        optimistic, most_likely, pessimistic, durations, pred_indptr, pred_indices, succ_indptr, succ_indices = arrays[:8]
+        forward = LevelSchedule.from_arrays(*arrays[8:12])
+        backward = LevelSchedule.from_arrays(*arrays[12:16])
+        network = CompiledNetwork.from_arrays([str(i) for i in range(n)], durations, pred_indptr, pred_indices, succ_indptr, succ_indices, forward, backward)
+        return cls(network, optimistic, most_likely, pessimistic, **options)
+
+
+def simulate_blocks(simulation, entropy, first_block, blocks, thresholds=(), max_paths=1000) -> list:
+    '''
+    run consecutive blocks of iterations, block b drawing from SeedSequence(entropy, spawn_key=(b,))
+
+    returns: SimulationStatistics of every block
+    '''
+    results = []
+    for block, (start, stop) in enumerate(blocks, first_block):
+        rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=(block,)))
+        statistics = SimulationStatistics(len(simulation), thresholds, max_paths=max_paths)
+        durations = simulation.sample(stop-start, rng)
+        statistics.update(*simulation.evaluate(durations), durations)
+        results.append(statistics)
+    return results
+
+
+def _merge_blocks(statistics, results, stop, progress=None) -> None:
+    # Merge in block order, which keeps every sum independent of the task split
+    for block_results in results:
+        for block_statistics in block_results:
+            if progress is None:
+                statistics.merge(block_statistics)
+            else:
+                progress.merge(statistics, block_statistics)
+            if stop is not None and stop(statistics):
+                return
+
+
+def _in_order(executor, tasks, window):
+    # Results of the tasks in submission order, with at most window tasks submitted ahead
+    pending = deque()
+    tasks = iter(tasks)
+    try:
+        for task in islice(tasks, window):
+            pending.append(executor.submit(_simulate_blocks, *task))
+        while pending:
+            result = pending.popleft().result()
+            for task in islice(tasks, 1):
+                pending.append(executor.submit(_simulate_blocks, *task))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def share_arrays(arrays) -> tuple:
+    '''
+    copy arrays into one block of shared memory, each on an 8-byte boundary
+
+    returns: the SharedMemory block (the caller closes and unlinks it) and the
+    layout [(dtype, length, offset)] that attach_arrays needs
+    '''
+    layout = []
+    offset = 0
+    for array in arrays:
+        layout.append((array.dtype.str, len(array), offset))
+        offset = (offset + array.nbytes + 7) // 8 * 8
+    memory = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for array, (dtype, length, start) in zip(arrays, layout):
+        np.ndarray(length, dtype=dtype, buffer=memory.buf, offset=start)[:] = array
+    return memory, layout
+
+
+def attach_arrays(name, layout) -> tuple:
+    '''
+    returns: the SharedMemory block (keep it open while the arrays are used) and
+    read-only views of its arrays
+    '''
+    memory = shared_memory.SharedMemory(name=name)
+    arrays = []
+    for dtype, length, offset in layout:
+        array = np.ndarray(length, dtype=dtype, buffer=memory.buf, offset=offset)
+        array.flags.writeable = False
+        arrays.append(array)
+    return memory, arrays
+
+
+# Simulation of a worker process, attached to the shared network once per worker
+_worker = None
+
+def _attach(name, layout, n, options) -> None:
+    global _worker
+    memory, arrays = attach_arrays(name, layout)
+    _worker = (memory, MonteCarlo.from_shared(arrays, n, options))
+
+
+def _simulate_blocks(entropy, first_block, blocks, thresholds, max_paths) -> list:
+    return simulate_blocks(_worker[1], entropy, first_block, blocks, thresholds, max_paths)
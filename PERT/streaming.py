@@ -0,0 +1,394 @@
+import numpy as np
+from scipy.stats import norm
+
+# Seed of the random job weights that hash sets of critical jobs, fixed so that
+# every process and every run hashes the same path to the same key
+PATH_HASH_SEED = 0x5EED
+
+
+class RunningMoments(object):
+    def __init__(self) -> None:
+        '''
+        count, mean, variance, minimum and maximum of a stream of values; blocks are
+        combined with Welford's update in the pairwise form of Chan et al.
+        '''
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        mean = values.mean()
+        self.__combine(len(values), mean, float(((values - mean)**2).sum()), values.min(), values.max())
+
+    def merge(self, other) -> None:
+        if other.count:
+            self.__combine(other.count, other.mean, other.m2, other.minimum, other.maximum)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def __combine(self, count, mean, m2, minimum, maximum) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean = float(self.mean + delta * count / total)
+        self.m2 = float(self.m2 + m2 + delta**2 * self.count * count / total)
+        self.count = total
+        self.minimum = float(min(self.minimum, minimum))
+        self.maximum = float(max(self.maximum, maximum))
+
+
+class QuantileSketch(object):
+    def __init__(self, k=1000) -> None:
+        '''
+        KLL quantile sketch: values are kept in levels, a value at level h standing for
+        2**h values of the stream. A level over its capacity is sorted and every other
+        value moves one level up, so the sketch keeps O(k log(n/k)) values for n updates.
+        Compactions alternate between odd and even positions instead of flipping a coin,
+        so sketches are reproducible.
+
+        parameters:
+        k: capacity of the top level; the rank error is roughly 1.7/k and the sketch
+            keeps about 3k values.
+        '''
+        self.k = k
+        self.count = 0
+        self.levels = [np.zeros(0)]
+        self.compactions = [0]
+
+    def update(self, values) -> None:
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.levels[0] = np.concatenate((self.levels[0], values))
+        self.count += len(values)
+        self.__compress()
+
+    def merge(self, other) -> None:
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.zeros(0))
+                self.compactions.append(0)
+            self.levels[level] = np.concatenate((self.levels[level], values))
+        self.count += other.count
+        self.__compress()
+
+    def weighted_values(self) -> tuple:
+        '''
+        returns: the kept values, sorted, and the number of stream values each stands for
+        '''
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level_values), 2.0**level) for level, level_values in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q):
+        '''
+        approximate q-quantile (q may be an array)
+        '''
+        values, weights = self.weighted_values()
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        ranks = np.cumsum(weights)
+        positions = np.searchsorted(ranks, np.asarray(q) * ranks[-1], side='left')
+        return values[np.minimum(positions, len(values)-1)]
+
+    def cdf(self, x):
+        '''
+        approximate fraction of the stream at or below x (x may be an array)
+        '''
+        values, weights = self.weighted_values()
+        if len(values) == 0:
+            return np.zeros(np.shape(x)) if np.ndim(x) else 0.0
+        ranks = np.concatenate(([0.0], np.cumsum(weights)))
+        return ranks[np.searchsorted(values, x, side='right')] / ranks[-1]
+
+    def __capacity(self, level) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2/3)**depth)))
+
+    def __compress(self) -> None:
+        # Compact the lowest full level until the sketch fits its total capacity
+        while sum(len(values) for values in self.levels) > sum(self.__capacity(level) for level in range(len(self.levels))):
+            level = next(level for level, values in enumerate(self.levels) if len(values) >= self.__capacity(level))
+            if level + 1 == len(self.levels):
+                self.levels.append(np.zeros(0))
+                self.compactions.append(0)
+            values = np.sort(self.levels[level])
+            # An odd value out stays on this level
+            even = len(values) - len(values) % 2
+            promoted = values[self.compactions[level] % 2:even:2]
+            self.compactions[level] += 1
+            self.levels[level] = values[even:]
+            self.levels[level+1] = np.concatenate((self.levels[level+1], promoted))
+
+
+class CrossMoments(object):
+    def __init__(self, n) -> None:
+        '''
+        means, variances and covariances of n job durations with the makespan, kept as
+        co-moment sums that are combined across blocks like RunningMoments
+        '''
+        self.count = 0
+        self.duration_mean = np.zeros(n)
+        self.duration_m2 = np.zeros(n)
+        self.makespan_mean = 0.0
+        self.makespan_m2 = 0.0
+        self.comoment = np.zeros(n)
+
+    def update(self, durations, makespans) -> None:
+        '''
+        parameters:
+        durations: (iterations x jobs) durations of a batch.
+        makespans: makespan of every iteration of the batch.
+        '''
+        if len(makespans) == 0:
+            return
+        other = CrossMoments(0)
+        other.count = len(makespans)
+        other.duration_mean = durations.mean(axis=0)
+        other.makespan_mean = float(makespans.mean())
+        duration_deviations = durations - other.duration_mean
+        makespan_deviations = makespans - other.makespan_mean
+        other.duration_m2 = np.einsum('ij,ij->j', duration_deviations, duration_deviations)
+        other.makespan_m2 = float(makespan_deviations @ makespan_deviations)
+        other.comoment = makespan_deviations @ duration_deviations
+        self.merge(other)
+
+    def merge(self, other) -> None:
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        weight = self.count * other.count / total
+        duration_delta = other.duration_mean - self.duration_mean
+        makespan_delta = other.makespan_mean - self.makespan_mean
+        self.duration_m2 = self.duration_m2 + other.duration_m2 + duration_delta**2 * weight
+        self.makespan_m2 = self.makespan_m2 + other.makespan_m2 + makespan_delta**2 * weight
+        self.comoment = self.comoment + other.comoment + duration_delta * makespan_delta * weight
+        self.duration_mean = self.duration_mean + duration_delta * other.count / total
+        self.makespan_mean = self.makespan_mean + makespan_delta * other.count / total
+        self.count = total
+
+    @property
+    def duration_std(self) -> np.ndarray:
+        return np.sqrt(self.duration_m2 / max(self.count - 1, 1))
+
+    @property
+    def correlation(self) -> np.ndarray:
+        '''
+        Pearson correlation of every job's duration with the makespan, 0 for constant durations
+        '''
+        scale = np.sqrt(self.duration_m2 * self.makespan_m2)
+        return np.divide(self.comoment, scale, out=np.zeros_like(self.comoment), where=scale > 0)
+
+
+class PathCounter(object):
+    def __init__(self, n, max_paths=1000) -> None:
+        '''
+        How often each set of critical jobs occurs, keyed by a 64-bit hash of the set:
+        the sum, wrapping around, of a fixed random weight per critical job.
+
+        parameters:
+        n: number of jobs.
+        max_paths: paths kept; when twice as many are seen, only the max_paths most
+            frequent survive, so memory stays bounded however many paths occur. The
+            counts of rare paths are then lower bounds; frequent paths are not affected.
+        '''
+        self.max_paths = max_paths
+        self.weights = np.random.default_rng(PATH_HASH_SEED).integers(0, 2**64, n, dtype=np.uint64, endpoint=False)
+        self.paths = {}
+
+    def hashes(self, critical) -> np.ndarray:
+        '''
+        path key of every row of a (rows x jobs) critical mask
+        '''
+        return np.where(critical, self.weights, np.uint64(0)).sum(axis=1, dtype=np.uint64)
+
+    def update(self, critical, makespans) -> None:
+        keys, first, inverse, counts = np.unique(self.hashes(critical), return_index=True, return_inverse=True, return_counts=True)
+        sums = np.bincount(inverse.reshape(-1), weights=makespans, minlength=len(keys))
+        for key, row, count, total in zip(keys.tolist(), first.tolist(), counts.tolist(), sums.tolist()):
+            self.__add(key, count, total, lambda: np.packbits(critical[row]).tobytes())
+
+    def merge(self, other) -> None:
+        for key, (count, total, mask) in other.paths.items():
+            self.__add(key, count, total, lambda: mask)
+
+    def most_common(self, n=None) -> list:
+        '''
+        returns: [(key, count, sum of makespans, packed critical mask)], most frequent first
+        '''
+        paths = sorted(self.paths.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(key, count, total, mask) for key, (count, total, mask) in paths[:n]]
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __add(self, key, count, total, mask) -> None:
+        path = self.paths.get(key)
+        if path is None:
+            self.paths[key] = (count, total, mask())
+        else:
+            self.paths[key] = (path[0] + count, path[1] + total, path[2])
+        if len(self.paths) > 2 * self.max_paths:
+            self.paths = {key: (count, total, mask) for key, count, total, mask in self.most_common(self.max_paths)}
+
+
+class SimulationStatistics(object):
+    def __init__(self, n, thresholds=(), k=1000, max_paths=1000) -> None:
+        '''
+        Makespan and criticality statistics of a simulation, updated batch by batch
+        and merged across processes in constant memory, whatever the iteration count.
+
+        parameters:
+        n: number of jobs.
+        thresholds: makespans for which P(makespan > threshold) is counted exactly.
+        k: accuracy of the quantile sketch.
+        max_paths: critical paths whose counts are kept.
+        '''
+        self.moments = RunningMoments()
+        self.sketch = QuantileSketch(k)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.exceedances = np.zeros(len(self.thresholds), dtype=np.int64)
+        self.critical_counts = np.zeros(n, dtype=np.int64)
+        self.cross = CrossMoments(n)
+        self.paths = PathCounter(n, max_paths)
+
+    def update(self, makespans, critical, durations) -> None:
+        '''
+        parameters:
+        makespans: makespan of every iteration of a batch.
+        critical: (iterations x jobs) mask of the critical jobs.
+        durations: (iterations x jobs) durations that were sampled.
+        '''
+        self.moments.update(makespans)
+        self.sketch.update(makespans)
+        self.exceedances += np.count_nonzero(makespans[:, None] > self.thresholds, axis=0)
+        self.critical_counts += np.count_nonzero(critical, axis=0)
+        self.cross.update(durations, makespans)
+        self.paths.update(critical, makespans)
+
+    def merge(self, other) -> None:
+        self.moments.merge(other.moments)
+        self.sketch.merge(other.sketch)
+        self.exceedances += other.exceedances
+        self.critical_counts += other.critical_counts
+        self.cross.merge(other.cross)
+        self.paths.merge(other.paths)
+
+    @property
+    def count(self) -> int:
+        return self.moments.count
+
+    @property
+    def mean(self) -> float:
+        return self.moments.mean
+
+    @property
+    def std(self) -> float:
+        return self.moments.std
+
+    @property
+    def criticality(self) -> np.ndarray:
+        '''
+        fraction of iterations in which each job was critical
+        '''
+        return self.critical_counts / max(self.count, 1)
+
+    @property
+    def cruciality(self) -> np.ndarray:
+        '''
+        correlation of each job's duration with the makespan
+        '''
+        return self.cross.correlation
+
+    @property
+    def significance(self) -> np.ndarray:
+        '''
+        significance sensitivity index of each job: criticality times the ratio of the job's
+        duration standard deviation to the makespan's
+        '''
+        return self.criticality * self.cross.duration_std / self.std if self.std > 0 else np.zeros(len(self.critical_counts))
+
+    def sensitivity(self, ids, n=None) -> list:
+        '''
+        returns: [(job id, criticality, cruciality, significance)] of the n jobs that drive
+        the schedule risk most, by significance then criticality
+        '''
+        criticality, cruciality, significance = self.criticality, self.cruciality, self.significance
+        order = np.lexsort((-criticality, -significance))[:n]
+        return [(ids[i], float(criticality[i]), float(cruciality[i]), float(significance[i])) for i in order.tolist()]
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def probability_over(self, threshold) -> float:
+        '''
+        P(makespan > threshold), exact for the thresholds given up front, from the sketch otherwise
+        '''
+        matches = np.flatnonzero(self.thresholds == threshold)
+        if len(matches):
+            return self.exceedances[matches[0]] / max(self.count, 1)
+        return float(1.0 - self.sketch.cdf(threshold))
+
+
+class Convergence(object):
+    def __init__(self, mean_tolerance=None, probability_tolerance=None, criticality_tolerance=None,
+                 threshold=None, confidence=0.95, min_iterations=1000) -> None:
+        '''
+        Stopping rule for an adaptive simulation: converged once every requested
+        confidence interval is narrower than its tolerance (full widths).
+
+        parameters:
+        mean_tolerance: width of the interval on the mean makespan, in time units.
+        probability_tolerance: width of the interval on P(makespan > threshold).
+        criticality_tolerance: width of the interval on the criticality index of
+            the mode path, the fraction of iterations in which it is critical.
+        threshold: makespan of the probability criterion; the simulation must count it
+            exactly, i.e. have it among its thresholds.
+        confidence: confidence level of the intervals.
+        min_iterations: iterations before convergence is first checked, so that
+            early, lucky estimates do not stop the run.
+        '''
+        self.mean_tolerance = mean_tolerance
+        self.probability_tolerance = probability_tolerance if threshold is not None else None
+        self.criticality_tolerance = criticality_tolerance
+        self.threshold = threshold
+        self.z = float(norm.ppf(0.5 + confidence/2))
+        self.min_iterations = min_iterations
+
+    def widths(self, statistics) -> dict:
+        '''
+        current interval widths of the requested criteria
+        '''
+        n = max(statistics.count, 1)
+        widths = {}
+        if self.mean_tolerance is not None:
+            widths['mean'] = 2 * self.z * statistics.std / np.sqrt(n)
+        if self.probability_tolerance is not None:
+            widths['probability'] = wilson_width(statistics.probability_over(self.threshold), n, self.z)
+        if self.criticality_tolerance is not None:
+            paths = statistics.paths.most_common(1)
+            widths['criticality'] = wilson_width(paths[0][1] / n if paths else 0.0, n, self.z)
+        return widths
+
+    def __call__(self, statistics) -> bool:
+        if statistics.count < self.min_iterations:
+            return False
+        tolerances = {'mean': self.mean_tolerance, 'probability': self.probability_tolerance, 'criticality': self.criticality_tolerance}
+        return all(width <= tolerances[name] for name, width in self.widths(statistics).items())
+
+
+def wilson_width(p, n, z) -> float:
+    '''
+    width of the Wilson score interval of a proportion p observed in n trials; unlike
+    the normal interval it does not collapse to zero when p is 0 or 1
+    '''
+    return 2 * z * np.sqrt(p*(1-p)/n + z*z/(4*n*n)) / (1 + z*z/n)
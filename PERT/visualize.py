@@ -1,8 +1,6 @@
 import networkx as nx
-import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
 import os, sys, ast
-from networkx.drawing.nx_agraph import graphviz_layout
 from os.path import realpath, dirname
 from collections import defaultdict
 from CPM import *
@@ -11,6 +9,11 @@ import pandas as pd
 import seaborn as sns
 from scipy.stats import norm
 from job_PERT import *
+from layout import DEFAULT_CACHE, compute_layout, detailed, new_figure, save_figure
+from simulation import MonteCarlo
+from analytic import makespan_distribution
+from streaming import Convergence
+from copula import Copula
 
 # Define a class State to represent each state with its incoming and outgoing jobs
 class State(object):
@@ -57,7 +60,7 @@ class State(object):
         return False
     
     def __hash__(self) -> int:
-        return int(self.id)
+        return hash(self.id)
 
     
 class StateAssembler(object):
@@ -146,7 +149,7 @@ class StateAssembler(object):
 def all_paths(network) -> list:
         def dfs(current, path):
             # If the current job is a sink, add the path to the result
-            if current in network.sinks:
+            if network.is_sink(current):
                 paths.append(path)
                 return
             
@@ -162,7 +165,18 @@ def all_paths(network) -> list:
         return paths
 
 DEAFULT_PATH = os.path.dirname(os.path.realpath(__file__))+'/output'
-def visualize_PERT(jobs: dict, CPM_results: tuple, network: Network, outputpath: str=DEAFULT_PATH) -> None:
+def visualize_PERT(jobs: dict, CPM_results: tuple, network: Network, outputpath: str=DEAFULT_PATH,
+                   show: bool=True, format: str='png', layout_cache=DEFAULT_CACHE) -> str:
+    '''
+    draw the network and save it to outputpath/PERT.<format>
+
+    parameters:
+    show: open a window with the figure; with False nothing touches pyplot or a display.
+    format: output format, e.g. 'png' or 'svg'.
+    layout_cache: LayoutCache reusing node positions of networks with the same structure.
+
+    returns: path of the saved image
+    '''
     mode_path_proportion, a, a, a, a, critical_path, makespan = CPM_results
     critical_paths = network.critical_paths
 
@@ -212,40 +226,42 @@ def visualize_PERT(jobs: dict, CPM_results: tuple, network: Network, outputpath:
                         break
                 graph.add_edge(state, out_state, label='D', is_critical=(truth[0] and truth[1]), is_dummy=True)
     # Draw the graph
-    plt.figure(figsize=(12, 6))
-    pos = graphviz_layout(graph, prog='dot')
+    figure = new_figure(show)
+    ax = figure.add_subplot()
+    pos = compute_layout(graph, layout_cache)
+    # Large graphs are drawn with plain lines and without edge labels
+    arrows = detailed(graph)
 
     # Draw edge labels within the edge names
     edge_labels = nx.get_edge_attributes(graph, 'label')
-    nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_size=8)
+    if arrows:
+        nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_size=8, ax=ax)
 
     # Draw non-critical, non-dummy edges
     non_critical_non_dummy_edges = [(u, v) for u, v, d in graph.edges(data=True) if not d['is_critical'] and not d['is_dummy']]
-    nx.draw_networkx_edges(graph, pos, edgelist=non_critical_non_dummy_edges, edge_color='black', arrows=True)
+    nx.draw_networkx_edges(graph, pos, edgelist=non_critical_non_dummy_edges, edge_color='black', arrows=arrows, ax=ax)
 
     # Draw non-critical dummy edges
     non_critical_dummy_edges = [(u, v) for u, v, d in graph.edges(data=True) if not d['is_critical'] and d['is_dummy']]
-    nx.draw_networkx_edges(graph, pos, edgelist=non_critical_dummy_edges, edge_color='lightgray', arrows=True)
+    nx.draw_networkx_edges(graph, pos, edgelist=non_critical_dummy_edges, edge_color='lightgray', arrows=arrows, ax=ax)
 
     # Draw critical edges
     critical_edges = [(u, v) for u, v, d in graph.edges(data=True) if d['is_critical']]
-    nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=True)
+    nx.draw_networkx_edges(graph, pos, edgelist=critical_edges, edge_color='red', arrows=arrows, ax=ax)
 
     # Draw non-critical nodes
     non_critical_nodes = [node for node in graph.nodes() if not node.is_critical]
-    nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500)
+    nx.draw_networkx_nodes(graph, pos, nodelist=non_critical_nodes, node_color='lightblue', node_size=500, ax=ax)
 
     # Draw critical nodes
     critical_path_nodes = [node for node in graph.nodes() if node.is_critical and not (len(node.incoming) == 0 or len(node.outgoing) == 0)]
-    nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500)
+    nx.draw_networkx_nodes(graph, pos, nodelist=critical_path_nodes, node_color='red', node_size=500, ax=ax)
 
     # Draw starting, ending nodes
     polar_nodes = [node for node in graph.nodes() if (len(node.incoming) == 0 or len(node.outgoing) == 0)]
-    nx.draw_networkx_nodes(graph, pos, nodelist=polar_nodes, node_color='darkblue', node_size=500)
+    nx.draw_networkx_nodes(graph, pos, nodelist=polar_nodes, node_color='darkblue', node_size=500, ax=ax)
 
-    plt.title('PERT')
-    if not os.path.exists(outputpath):
-        os.makedirs(outputpath)
+    ax.set_title('PERT')
     makespan_line = mlines.Line2D([], [], color='none', label=f'Mode Makespan: {makespan}')
     mode_path_proportion_line = mlines.Line2D([], [], color='none', label=f'Proportion = {mode_path_proportion}%')
     c_line = mlines.Line2D([], [], color='red', marker='_', markersize=15, label='Mode Critical Paths')
@@ -253,17 +269,49 @@ def visualize_PERT(jobs: dict, CPM_results: tuple, network: Network, outputpath:
     d_line = mlines.Line2D([], [], color='lightgray', marker='_', markersize=15, label='D: Dummy Job')
 
     # Add the legend to the plot
-    plt.legend(handles=[makespan_line, mode_path_proportion_line, c_line, j_line, d_line], loc='lower left', frameon=False)
-
-    plt.savefig(outputpath+'/PERT.png')
-    plt.show()
-
-def run(inputpath, outputpath, threshold):
+    ax.legend(handles=[makespan_line, mode_path_proportion_line, c_line, j_line, d_line], loc='lower left', frameon=False)
+
+    return save_figure(figure, outputpath+'/PERT', format, show)
+
+ITERATION = 50000
+# Cap on the iterations of an adaptive run
+MAX_ITERATION = 10**7
+# Jobs listed in the sensitivity report
+SENSITIVITY_JOBS = 10
+def run(inputpath, outputpath, threshold, show=True, format='png', iterations=None, seed=None, processes=1,
+        mean_tolerance=None, probability_tolerance=None, criticality_tolerance=None, distribution='normal', sampling='random', analytic='clark',
+        correlation=None, copula_df=None, checkpoint=None):
+    '''
+    parameters:
+    iterations: number of iterations, ITERATION by default; the cap of an adaptive run,
+        MAX_ITERATION by default.
+    mean_tolerance, probability_tolerance, criticality_tolerance: giving any of them makes
+        the run adaptive: batches are drawn until the 95% confidence intervals on the mean
+        makespan, on P(makespan > threshold) and on the criticality index of the mode path
+        are narrower than these widths.
+    distribution: duration distribution of the simulation, 'normal', 'truncated_normal',
+        'beta', 'pert', 'triangular' or 'lognormal'. An optional distribution column of
+        the CSV overrides it for its jobs; blank cells keep this one.
+    sampling: 'random', or a variance-reduction design: 'antithetic', 'latin_hypercube'
+        or 'sobol'.
+    analytic: also draw and report the analytic makespan distribution, 'clark' or
+        'discrete' (see analytic.py), or None. It treats durations as independent.
+    correlation: correlation of the durations of jobs sharing a value of the CSV's
+        group column (a crew, a site), one number or a dictionary by group; or a
+        copula.Copula, e.g. built from a sparse correlation matrix. None keeps the
+        durations independent.
+    copula_df: degrees of freedom of a t copula for the group correlation, None for
+        a Gaussian copula.
+    checkpoint: file saving the simulation's progress every minute; rerunning with the
+        same file resumes an interrupted run, or extends it to more iterations.
+    '''
     df = pd.read_csv(inputpath)
 
     # Convert the "predecessors" column to a list
     df['predecessors'] = df['predecessors'].apply(ast.literal_eval)
     df['id'] = df['id'].apply(str)
+    if 'distribution' in df:
+        df['distribution'] = df['distribution'].fillna(distribution)
 
 
     # Convert the DataFrame to a dictionary
@@ -274,86 +322,75 @@ def run(inputpath, outputpath, threshold):
 
     jobs = {id: OJob(**job_data) for id, job_data in jobs_dict.items()}
 
-    # Create the network and add jobs and dependencies
-    network = Network(jobs)
-
-    # Find out all possible paths
-    paths = all_paths(network)
+    # Create the network and add jobs and dependencies; paths are not enumerated up front,
+    # CPM() generates at most MAX_CRITICAL_PATHS critical paths from the zero-slack subgraph
+    network = Network(jobs, lazy_paths=True, max_critical_paths=MAX_CRITICAL_PATHS)
 
     # Run the CPM algorithm
     CPM_results = CPM(network)
     earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, critical_path, makespan = CPM_results
+    # Normal approximation of the longest critical path, from the PERT moments of its jobs
+    pert_mean = dict(zip(df['id'], (df['optimistic'] + 4*df['most_likely'] + df['pessimistic'])/6))
+    pert_variance = dict(zip(df['id'], ((df['pessimistic'] - df['optimistic'])/6)**2))
     mean = 0
     std = 0
     for critical_path in network.critical_paths:
-        id_list = [job.id for job in critical_path]
-        X = df[df['id'].isin(id_list)]
-        X = X[['optimistic', 'most_likely', 'pessimistic']].values
-        
-        tmp_mean = 0
-        tmp_std = 0
-        for i in range(len(X)):
-            tmp_mean += (X[i][0]+4*X[i][1]+X[i][2])/6
-            tmp_std += ((X[i][2]-X[i][0])/6)*((X[i][2]-X[i][0])/6)
-        tmp_std = np.sqrt(tmp_std)
-
+        tmp_mean = sum(pert_mean[job.id] for job in critical_path)
+        tmp_std = np.sqrt(sum(pert_variance[job.id] for job in critical_path))
         if tmp_mean > mean:
             mean = tmp_mean
             std = tmp_std
 
-    makespans = []
-    critical_paths = defaultdict(int)
-    tmp = {}
-    tmp_makespans = defaultdict(list)
-
-    ITERATION = 50000
-    for i in range(ITERATION):
-        jobs, CPM_results, network = cal(jobs_dict)
-        earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, critical_path, makespan = CPM_results
-        makespans += [makespan]
-        for critical_path in network.critical_paths:
-            critical_paths[str(critical_path)] += 1
-            tmp[str(critical_path)] = (jobs, CPM_results, network)
-            tmp_makespans[str(critical_path)].append(makespan)
-
-    plt.figure()
-    min_makespan = np.min(makespans)
-    max_makespan = np.max(makespans)
-    sns.kdeplot(makespans, fill=True)
+    # Draw every duration of a batch of iterations at once and run CPM over the whole batch
+    copula = correlation
+    if correlation is not None and not isinstance(correlation, Copula):
+        copula = Copula.from_groups(df['group'] if 'group' in df else [None]*len(df), correlation, copula_df)
+    simulation = MonteCarlo.from_rows(jobs_dict.values(), distribution=distribution, sampling=sampling, copula=copula)
+    convergence = None
+    if (mean_tolerance, probability_tolerance, criticality_tolerance) != (None, None, None):
+        convergence = Convergence(mean_tolerance, probability_tolerance, criticality_tolerance, threshold)
+    if iterations is None:
+        iterations = ITERATION if convergence is None else MAX_ITERATION
+    statistics = simulation.simulate(iterations, seed=seed, processes=processes, thresholds=() if threshold is None else (threshold,), stop=convergence, checkpoint=checkpoint)
+
+    figure = new_figure(show, figsize=None)
+    ax = figure.add_subplot()
+    min_makespan = statistics.moments.minimum
+    max_makespan = statistics.moments.maximum
+    # The quantile sketch stands in for the makespans, which are not kept
+    values, weights = statistics.sketch.weighted_values()
+    sns.kdeplot(x=values, weights=weights, fill=True, ax=ax)
     x = np.linspace(min_makespan, max_makespan, 1000)
     y = (1 / np.sqrt(2 * np.pi * std**2)) * np.exp(-(x-mean)**2 / (2 * std**2))
-    plt.plot(x, y)
+    ax.plot(x, y)
+    if analytic is not None:
+        analytic_x, analytic_cdf = makespan_distribution(simulation, analytic)
+        ax.plot(analytic_x, np.gradient(analytic_cdf, analytic_x), linestyle=':', label=analytic)
+        ax.set_xlim(min_makespan, max_makespan)
     if threshold is not None:
-        plt.axvline(x=threshold, color='blue', linestyle='--', label=f'{threshold}')
-    plt.title('Density Plot of Makespans')
-    plt.xlabel('Makespan')
-    plt.savefig(outputpath+'/density_plot.png')
+        ax.axvline(x=threshold, color='blue', linestyle='--', label=f'{threshold}')
+    ax.set_title('Density Plot of Makespans')
+    ax.set_xlabel('Makespan')
+    figure.savefig(outputpath+'/density_plot.'+format)
     
-    max_key = max(critical_paths, key=critical_paths.get)
-    jobs, CPM_results, network = tmp[max_key]
-
-    earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, critical_path, makespan = CPM_results
-    CPM_results = earliest_start_time, earliest_finish_time, latest_start_time, latest_finish_time, slacks, list(max_key), makespan
-    makespan = round(np.average(tmp_makespans[max_key]), 1)
-    mode_path_proportion = np.round(critical_paths[max_key]/ITERATION*100, 2)
-    print("Mode Critical Path:", max_key)
+    _, count, makespan_sum, mask = statistics.paths.most_common(1)[0]
+    critical_path = [jobs[id] for id in simulation.path_ids(mask)]
+    network.critical_paths = [critical_path]
+
+    makespan = round(makespan_sum/count, 1)
+    mode_path_proportion = np.round(count/statistics.count*100, 2)
+    print("Iterations:", statistics.count)
+    print("Mode Critical Path:", critical_path)
     print("Mode Makespan: ", makespan)
     print(f"Mode Path Proportion:  {mode_path_proportion}%")
+    # Activities driving the schedule risk
+    print('Job\tcriticality\tcruciality\tSSI')
+    for id, criticality, cruciality, significance in statistics.sensitivity(simulation.network.ids, SENSITIVITY_JOBS):
+        print(f'{id}\t{round(100.0*criticality, 2)}%\t\t{round(cruciality, 3)}\t\t{round(significance, 3)}')
     if threshold is not None:
-        print(f'             \tsim\texpected')
-        print(f'Prob over {threshold}:\t{round(100.0*sum(1 for span in makespans if span > threshold)/len(makespans), 2)}%\t{round(100.0*(1-norm.cdf(threshold, mean, std)), 2)}%')
+        print(f'             \tsim\texpected' + ('\tanalytic' if analytic is not None else ''))
+        print(f'Prob over {threshold}:\t{round(100.0*statistics.probability_over(threshold), 2)}%\t{round(100.0*(1-norm.cdf(threshold, mean, std)), 2)}%'
+              + (f'\t{round(100.0*(1-np.interp(threshold, analytic_x, analytic_cdf)), 2)}%' if analytic is not None else ''))
 
     CPM_results = (mode_path_proportion, 0, 0, 0, 0, critical_path, makespan)
-    visualize_PERT(jobs, CPM_results, network, outputpath=outputpath)
-
-
-def cal(jobs_dict):
-    # Convert the dictionary back to Job objects
-    jobs = {id: PJob(**job_data) for id, job_data in jobs_dict.items()}
-
-    # Create the network and add jobs and dependencies
-    network = Network(jobs)
-
-    # Run the CPM algorithm
-    CPM_results = CPM(network)
-    return jobs, CPM_results, network
+    visualize_PERT(jobs, CPM_results, network, outputpath=outputpath, show=show, format=format)
@@ -73,7 +73,7 @@ class State(object):
         return False
     
     def __hash__(self) -> int:
-        return int(self.id)
+        return hash(self.id)
 
     
 class StateAssembler(object):
@@ -1,7 +1,13 @@
 from collections import defaultdict
-from typing import Tuple, List, Dict
+from typing import List, Dict
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'CPM'))
+from topology import topological_sort
 
 class Job(object):
+    __slots__ = ('id', 'duration', 'predecessors', 'p_max', 'p_min', 'cost', 'marginal_cost', 'is_dummy', 'prev_state')
+
     def __init__(self, id, predecessors, p_max, p_min, cost, marginal_cost, is_dummy=False, prev_state=None) -> None:
         self.id = str(id)
         self.duration = p_max
@@ -11,22 +17,17 @@ class Job(object):
         self.cost = cost
         self.marginal_cost = marginal_cost
         self.is_dummy = is_dummy
-        if self.is_dummy:
-            self.prev_state = prev_state
+        self.prev_state = prev_state if is_dummy else None
 
     def __repr__(self) -> str:
         return self.id
     
     def __eq__(self, __value: object) -> bool:
+        # A job is identified by its id; its duration changes while the network is crashed
+        if self is __value:
+            return True
         if isinstance(__value, Job):
-            return (self.id == __value.id
-                    and self.duration == __value.duration
-                    and self.predecessors == __value.predecessors
-                    and self.p_max == __value.p_max
-                    and self.p_min == __value.p_min
-                    and self.cost == __value.cost
-                    and self.marginal_cost == __value.marginal_cost
-                    and self.is_dummy == __value.is_dummy)
+            return self.id == __value.id and self.is_dummy == __value.is_dummy
         return False
     
     def __hash__(self):
@@ -126,37 +127,14 @@ class Network:
 
     def sort(self) -> None:
         self.sources, self.sinks, self.jobs = topological_sort(self.jobs, self.successors)
+        self.source_ids = set(job.id for job in self.sources)
+        self.sink_ids = set(job.id for job in self.sinks)
 
-    def get_jobs(self) -> List[Job]:
-        return self.jobs
+    def is_source(self, job) -> bool:
+        return job.id in self.source_ids
 
-def topological_sort(jobs, successors) -> Tuple[list, list, list]:
-    in_degree = defaultdict(int)
-    sorted_order = []
+    def is_sink(self, job) -> bool:
+        return job.id in self.sink_ids
 
-    # Calculate in-degree for each job
-    for job in jobs:
-        for successor in successors[job.id]:
-            in_degree[successor.id] += 1
-
-    # Find jobs with no incoming edges (in-degree = 0)
-    sources = [job for job in jobs if job.id not in in_degree or in_degree[job.id] == 0]
-    sources_to_return = [job for job in jobs if job.id not in in_degree or in_degree[job.id] == 0]
-    sinks = []
-
-    # Perform topological sort
-    while sources:
-        job = sources.pop(0)
-        sorted_order.append(job)
-
-        # Decrement the in-degree of each successor and add to sources if in-degree becomes 0
-        for successor in successors[job.id]:
-            in_degree[successor.id] -= 1
-            if in_degree[successor.id] == 0:
-                sources.append(successor)
-
-        # Check if the job is a sink (no outgoing edges)
-        if job.id not in successors or len(successors[job.id]) == 0:
-            sinks.append(job)
-
-    return sources_to_return, sinks, sorted_order
+    def get_jobs(self) -> List[Job]:
+        return self.jobs
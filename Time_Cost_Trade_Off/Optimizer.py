@@ -1,6 +1,7 @@
 from typing import Tuple, List, Dict
 from itertools import chain, combinations
 from Jobs import *
+from topology import id_key
 from AdjacencyTable import AdjacencyTable
 from CPM_visualize import *
 from matplotlib.widgets import Button
@@ -55,7 +56,7 @@ class PathFinder(object):
             earliest_start_time[job.id] = 0  # Initialize earliest start time to 0
 
         for job in jobs:
-            if job in network.sources:
+            if network.is_source(job):
                 # Job has no dependencies, set earliest finish time to its duration
                 earliest_finish_time[job.id] = job.duration
             else:
@@ -80,10 +81,9 @@ class PathFinder(object):
             latest_finish_time[job.id] = project_duration  # Initialize latest finish time to project duration
             latest_start_time[job.id] = project_duration - job.duration
 
-        jobs.reverse()
-        for job in jobs:
+        for job in reversed(jobs):
             # Calculate latest start time as the minimum of latest start times of dependent jobs
-            if job in network.sinks:
+            if network.is_sink(job):
                 continue
             else:
                 latest_finish_time[job.id] = min(latest_start_time[successor.id] for successor in successors[job.id])
@@ -102,7 +102,7 @@ class PathFinder(object):
     @staticmethod
     def __calculate_critical_path(slacks) -> List[Job]:
         critical_path = [job for job, slack_time in slacks.items() if slack_time == 0]
-        return sorted(critical_path, key=(lambda x : int(x.id)))
+        return sorted(critical_path, key=(lambda x : id_key(x.id)))
 
     def CPM(self) -> List[Job]:
         self.network.sort()
@@ -116,7 +116,7 @@ class PathFinder(object):
     def all_paths(self) -> List[List[Job]]:
         def dfs(current, path):
             # If the current job is a sink, add the path to the result
-            if current in self.network.sinks:
+            if self.network.is_sink(current):
                 paths.append(path)
                 return
             